@@ -0,0 +1,133 @@
+"""End-to-end cost of a poll: HTTP fetch, parse, coordinator update and entity fan-out.
+
+Every payload of the corpus is served by a local stand-in of the WES. Each round
+alternates between the recorded payload and a copy with moving readings, so that
+the listeners of the changed fields are updated like on a live device. The idle
+runs serve the same payload on every round, like a house where nothing moves.
+Run from the repository root:
+    python benchmarks/bench_end_to_end.py [rounds]
+"""
+import asyncio
+import pathlib
+import re
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).parent.resolve()
+sys.path.insert(0, str(ROOT.parent))
+sys.path.insert(0, str(ROOT))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from cartelectronic_wes.const import FILENAME_SENSOR_CGX, TIC_COUNT  # noqa: E402
+from cartelectronic_wes.coordinator import WesCoordinator  # noqa: E402
+from cartelectronic_wes.sensor import setup_clamps_sensors, setup_1wire_probe, setup_tic_sensors, probe_in_use  # noqa: E402
+from cartelectronic_wes.tic import tic_meter_model  # noqa: E402
+from cartelectronic_wes.wes import WesApi  # noqa: E402
+from fake_wes import PAYLOADS_DIR, start_fake_wes  # noqa: E402
+
+ROUNDS = 200
+# Readings moved between two rounds: clamp currents, probes and TIC instant values
+MOVING_PATTERN = re.compile(rb"<(I|probe\d+|PAP|IINST\d?)>(\d+)")
+
+
+def moving_readings(payload):
+    """Return a copy of payload with the last digit of the moving readings changed."""
+    return MOVING_PATTERN.sub(lambda m: b"<%s>%d" % (m.group(1), int(m.group(2)) + 1), payload)
+
+
+class Timer:
+    """Accumulate the time spent in an awaitable or a callable."""
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.calls = 0
+
+    def wrap_async(self, func):
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.total += time.perf_counter() - start
+                self.calls += 1
+        return timed
+
+    def wrap(self, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.total += time.perf_counter() - start
+                self.calls += 1
+        return timed
+
+    def per_call_ms(self):
+        return self.total / max(self.calls, 1) * 1000
+
+
+async def run(hass, path, rounds, idle=False):
+    payload = path.read_bytes()
+    variants = (payload, payload if idle else moving_readings(payload))
+    farm = await start_fake_wes(1, payload=payload)
+    api = WesApi(farm.hosts[0], user="admin", password="wes", sensor_filename=FILENAME_SENSOR_CGX)
+    coordinator = WesCoordinator(hass, api)
+    await coordinator.async_refresh()
+    await api.set_device_property()
+
+    # Probes not connected get no entity, like in the sensor platform
+    probes = [entity for entity in setup_1wire_probe(coordinator) if probe_in_use(coordinator.data.value(entity._field))]
+    entities = setup_clamps_sensors(coordinator) + probes
+    # TIC sensors of the labels each meter reports
+    for i in range(1, TIC_COUNT + 1):
+        if model := tic_meter_model(coordinator.data, i):
+            entities += setup_tic_sensors(coordinator, i, model)
+    writes = 0
+
+    def count_write():
+        nonlocal writes
+        writes += 1
+
+    for number, entity in enumerate(entities):
+        entity.hass = hass
+        entity.entity_id = f"sensor.wes_bench_{number}"
+        # Only the cost of the integration is measured, not the state machine of Home Assistant
+        entity.async_write_ha_state = count_write
+        await entity.async_added_to_hass()
+
+    fetch = Timer()
+    fan_out = Timer()
+    api.fetch_sensor_data = fetch.wrap_async(api.fetch_sensor_data)
+    coordinator.async_update_listeners = fan_out.wrap(coordinator.async_update_listeners)
+    start = time.perf_counter()
+    for round in range(rounds):
+        farm.payload = variants[round % 2]
+        await coordinator.async_refresh()
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{path.name:<18} {'idle' if idle else 'moving':<6} {len(payload):6d} B {len(entities):4d} entities"
+        f"  poll {elapsed / rounds * 1000:6.3f} ms  fetch+parse {fetch.per_call_ms():6.3f} ms"
+        f"  fan-out {fan_out.per_call_ms():6.3f} ms  writes/poll {writes / rounds:5.1f}"
+        f"  unchanged {api.metrics.unchanged_payloads / rounds:4.0%}"
+    )
+    for entity in entities:
+        entity._call_on_remove_callbacks()
+    await coordinator.async_shutdown()
+    await api.close()
+    await farm.close()
+
+
+async def main(rounds):
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        print(f"{rounds} polls per payload")
+        for path in sorted(PAYLOADS_DIR.glob("*.xml")):
+            for idle in (False, True):
+                await run(hass, path, rounds, idle)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else ROUNDS))
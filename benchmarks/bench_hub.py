@@ -0,0 +1,87 @@
+"""Poll many simulated WES at the same time, with and without the hub.
+
+Reports the wall time of a polling round, the peak of parallel requests and the
+longest event loop stall. With the hub, a round must take no longer than the batches of
+concurrent polls allow, and reach the concurrency limit. Run from the repository root:
+    python benchmarks/bench_hub.py [devices]
+"""
+import asyncio
+import pathlib
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).parent.resolve()
+sys.path.insert(0, str(ROOT.parent))
+sys.path.insert(0, str(ROOT))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from cartelectronic_wes.const import FILENAME_SENSOR_CGX  # noqa: E402
+from cartelectronic_wes.coordinator import WesCoordinator  # noqa: E402
+from cartelectronic_wes.hub import HUB_MAX_CONCURRENT_POLLS, WesHub  # noqa: E402
+from cartelectronic_wes.wes import WesApi  # noqa: E402
+from fake_wes import start_fake_wes  # noqa: E402
+
+ROUNDS = 10
+DEVICE_LATENCY = 0.02
+LAG_PROBE_INTERVAL = 0.005
+# Allowance over the time of the batches of polls for the integration and the fake devices
+ROUND_TIME_MARGIN = 2
+
+
+async def probe_loop_lag(lags):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        lags.append(loop.time() - start - LAG_PROBE_INTERVAL)
+
+
+async def run(hass, farm, use_hub):
+    coordinators = []
+    hub = WesHub() if use_hub else None
+    for host in farm.hosts:
+        api = WesApi(host, user="admin", password="wes", sensor_filename=FILENAME_SENSOR_CGX)
+        coordinator = WesCoordinator(hass, api)
+        if hub is not None:
+            hub.register(coordinator)
+        coordinators.append(coordinator)
+    farm.max_in_flight = 0
+    lags = []
+    probe = asyncio.create_task(probe_loop_lag(lags))
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        # Worst case: every device due at the same time
+        await asyncio.gather(*(coordinator.async_refresh() for coordinator in coordinators))
+    elapsed = time.perf_counter() - start
+    probe.cancel()
+    failed = sum(not coordinator.last_update_success for coordinator in coordinators)
+    for coordinator in coordinators:
+        if hub is not None:
+            hub.unregister(coordinator)
+        await coordinator.api.close()
+    print(
+        f"  {'hub' if use_hub else 'no hub':<7} {elapsed / ROUNDS * 1000:8.1f} ms/round"
+        f"  max parallel {farm.max_in_flight:3d}  max loop stall {max(lags, default=0) * 1000:6.1f} ms"
+        f"  failed {failed}"
+    )
+    return elapsed / ROUNDS, farm.max_in_flight
+
+
+async def main(devices):
+    farm = await start_fake_wes(devices, latency=DEVICE_LATENCY)
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        print(f"{devices} devices, {ROUNDS} rounds, {DEVICE_LATENCY * 1000:.0f} ms device latency")
+        await run(hass, farm, False)
+        round_time, max_parallel = await run(hass, farm, True)
+    # Polls are only bounded by the concurrency limit, not serialized
+    batches = -(-devices // HUB_MAX_CONCURRENT_POLLS)
+    assert round_time <= batches * DEVICE_LATENCY * ROUND_TIME_MARGIN, f"hub round {round_time * 1000:.0f} ms"
+    assert max_parallel == min(devices, HUB_MAX_CONCURRENT_POLLS), f"{max_parallel} polls in parallel"
+    await farm.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -0,0 +1,73 @@
+"""Micro-benchmark of the CGX payload parser against xmltodict.
+
+Also measures the hand-off of a parse to a worker thread, the payload size above which the
+parse costs the event loop more than the hand-off is the lower bound of DEFAULT_PARSE_THRESHOLD.
+
+Run from the repository root (xmltodict is only needed here):
+    python benchmarks/bench_parser.py
+"""
+import asyncio
+import pathlib
+import sys
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+import xmltodict
+
+ROOT = pathlib.Path(__file__).parent.resolve()
+sys.path.insert(0, str(ROOT.parent))
+
+from cartelectronic_wes.const import DEFAULT_PARSE_THRESHOLD  # noqa: E402
+from cartelectronic_wes.parser import WesPayloadParser, parse_payload  # noqa: E402
+
+PAYLOADS_DIR = ROOT.joinpath("payloads")
+CHUNK_SIZE = 4096
+NUMBER = 2000
+
+
+def parse_xmltodict(payload):
+    # Previous implementation: decode then build the nested OrderedDict tree
+    data = xmltodict.parse(payload.decode("ISO-8859-1"))
+    return data.get("data", data)
+
+
+def parse_streaming(payload):
+    parser = WesPayloadParser()
+    for i in range(0, len(payload), CHUNK_SIZE):
+        parser.feed(payload[i:i + CHUNK_SIZE])
+    return parser.close()
+
+
+async def measure_handoff(number=NUMBER):
+    """Return the best time (s) of a round trip of a no-op through a worker thread."""
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(1) as executor:
+        await loop.run_in_executor(executor, int)
+        best = float("inf")
+        for _ in range(number):
+            start = time.perf_counter()
+            await loop.run_in_executor(executor, int)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    per_byte = []
+    for path in sorted(PAYLOADS_DIR.glob("*.xml")):
+        payload = path.read_bytes()
+        snapshot = parse_payload(payload)
+        print(f"{path.name} ({len(payload)} bytes, {len(snapshot.layout.fields) + len(snapshot.extra)} fields)")
+        for name, func in (("xmltodict", parse_xmltodict), ("streaming", parse_streaming)):
+            best = min(timeit.repeat(lambda: func(payload), number=NUMBER, repeat=5))
+            print(f"  {name:<10} {best / NUMBER * 1e6:8.1f} us/parse")
+        per_byte.append(best / NUMBER / len(payload))
+    handoff = asyncio.run(measure_handoff())
+    break_even = handoff / max(per_byte)
+    print(f"thread hand-off {handoff * 1e6:.1f} us, break-even {break_even:.0f} bytes, threshold {DEFAULT_PARSE_THRESHOLD} bytes")
+    assert DEFAULT_PARSE_THRESHOLD < min(path.stat().st_size for path in PAYLOADS_DIR.glob("*.xml")), \
+        "full sensor files must be parsed off the event loop by default"
+
+
+if __name__ == "__main__":
+    main()
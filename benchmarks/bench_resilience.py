@@ -0,0 +1,74 @@
+"""Behaviour of the coordinator against a simulated WES with latency, jitter and errors.
+
+Reports the poll success ratio and the intervals chosen by the adaptive scheduler under
+a given error rate, and the AJAX requests sent for a burst of switch commands.
+Run from the repository root:
+    python benchmarks/bench_resilience.py [error rate]
+"""
+import asyncio
+import logging
+import pathlib
+import statistics
+import sys
+import tempfile
+
+ROOT = pathlib.Path(__file__).parent.resolve()
+sys.path.insert(0, str(ROOT.parent))
+sys.path.insert(0, str(ROOT))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from cartelectronic_wes.const import FILENAME_SENSOR_CGX, VIRTUAL_SWITCH_COUNT  # noqa: E402
+from cartelectronic_wes.coordinator import WesCoordinator  # noqa: E402
+from cartelectronic_wes.wes import WesApi  # noqa: E402
+from wes_simulator import start_simulator  # noqa: E402
+
+ROUNDS = 100
+LATENCY = 0.02
+JITTER = 0.015
+
+
+async def poll(hass, simulator):
+    api = WesApi(simulator.hosts[0], user="admin", password="wes", sensor_filename=FILENAME_SENSOR_CGX)
+    coordinator = WesCoordinator(hass, api)
+    intervals = []
+    successes = 0
+    for _ in range(ROUNDS):
+        await coordinator.async_refresh()
+        successes += coordinator.last_update_success
+        intervals.append(coordinator.update_interval.total_seconds())
+    poll_ms = api.metrics.stages["poll"].as_dict()
+    print(
+        f"  polls   success {successes / ROUNDS:4.0%}  interval mean {statistics.mean(intervals):5.1f} s"
+        f"  max {max(intervals):5.1f} s  poll p50 {poll_ms['p50_ms'] or 0:5.1f} ms  p95 {poll_ms['p95_ms'] or 0:5.1f} ms"
+    )
+    await coordinator.async_shutdown()
+    await api.close()
+
+
+async def commands(simulator):
+    api = WesApi(simulator.hosts[0], user="admin", password="wes", sensor_filename=FILENAME_SENSOR_CGX)
+    simulator.commands = 0
+    # A scene switching every virtual switch at once
+    results = await asyncio.gather(
+        *(api.switch_vs(i, True) for i in range(1, VIRTUAL_SWITCH_COUNT + 1)), return_exceptions=True
+    )
+    accepted = sum(result is True for result in results)
+    print(f"  burst   {VIRTUAL_SWITCH_COUNT} commands, {accepted} accepted, {simulator.commands} AJAX requests")
+    await api.close()
+
+
+async def main(error_rate):
+    # Failed polls are expected, don't log each of them
+    logging.getLogger("cartelectronic_wes").setLevel(logging.CRITICAL)
+    simulator = await start_simulator(1, latency=LATENCY, jitter=JITTER, error_rate=error_rate, max_connections=2, seed=0)
+    print(f"{ROUNDS} polls, {LATENCY * 1000:.0f}±{JITTER * 1000:.0f} ms latency, {error_rate:.0%} errors")
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        await poll(hass, simulator)
+        await commands(simulator)
+    await simulator.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(float(sys.argv[1]) if len(sys.argv) > 1 else 0.2))
@@ -0,0 +1,132 @@
+"""Local stand-in for the FTP server of a WES, keeping the uploaded files in memory.
+
+Implements the commands used by WesFtp, in passive mode only. Run in its own threads,
+so the blocking client can be driven from the tests or an event loop executor.
+"""
+import socket
+import socketserver
+import threading
+
+
+class FakeFtpHandler(socketserver.StreamRequestHandler):
+    """One control connection, the server object holds the files and the counters."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.logged = False
+        self.user = None
+        self.data_socket = None
+        self.reply("220 WES FTP")
+        for raw in self.rfile:
+            command, _, argument = raw.decode().strip().partition(" ")
+            command = command.upper()
+            if command == "QUIT":
+                self.reply("221 Bye")
+                break
+            handler = getattr(self, f"ftp_{command.lower()}", None)
+            if handler is None:
+                self.reply(f"502 {command} not implemented")
+            elif not self.logged and command not in ("USER", "PASS"):
+                self.reply("530 Not logged in")
+            else:
+                handler(argument)
+
+    def ftp_user(self, argument):
+        self.user = argument
+        self.reply("331 Password required")
+
+    def ftp_pass(self, argument):
+        if (self.user, argument) == self.server.credentials:
+            self.logged = True
+            self.reply("230 Logged in")
+        else:
+            self.reply("530 Login incorrect")
+
+    def ftp_type(self, argument):
+        self.reply("200 Type set")
+
+    def ftp_noop(self, argument):
+        self.reply("200 OK")
+
+    def ftp_pasv(self, argument):
+        self.data_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.data_socket.bind(("127.0.0.1", 0))
+        self.data_socket.listen(1)
+        port = self.data_socket.getsockname()[1]
+        self.reply(f"227 Entering Passive Mode (127,0,0,1,{port >> 8},{port & 0xff})")
+
+    def _transfer(self, send=None):
+        connection, _ = self.data_socket.accept()
+        received = bytearray()
+        with connection:
+            if send is not None:
+                connection.sendall(send)
+            else:
+                while chunk := connection.recv(8192):
+                    received += chunk
+        self.data_socket.close()
+        self.data_socket = None
+        return bytes(received)
+
+    def ftp_size(self, argument):
+        if argument in self.server.files:
+            self.reply(f"213 {len(self.server.files[argument])}")
+        else:
+            self.reply("550 No such file")
+
+    def ftp_retr(self, argument):
+        if argument not in self.server.files:
+            self.reply("550 No such file")
+            return
+        self.reply("150 Opening data connection")
+        self._transfer(send=self.server.files[argument])
+        self.reply("226 Transfer complete")
+
+    def ftp_stor(self, argument):
+        self.reply("150 Opening data connection")
+        data = self._transfer()
+        self.server.files[argument] = self.server.corrupt(data) if self.server.corrupt else data
+        self.server.uploads.append(argument)
+        self.reply("226 Transfer complete")
+
+    def ftp_dele(self, argument):
+        if self.server.files.pop(argument, None) is None:
+            self.reply("550 No such file")
+        else:
+            self.reply("250 Deleted")
+
+
+class FakeFtpServer(socketserver.ThreadingTCPServer):
+    """FTP server on a free port of the loopback interface.
+
+    corrupt, when set, transforms the stored data to simulate a broken upload.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, user="adminftp", password="wesftp", files=None) -> None:
+        super().__init__(("127.0.0.1", 0), FakeFtpHandler)
+        self.credentials = (user, password)
+        self.files = dict(files or {})
+        self.uploads = []
+        self.connections = 0
+        self.corrupt = None
+        self.port = self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+def start_fake_ftp(user="adminftp", password="wesftp", files=None):
+    """Start a stand-in FTP server, its port is in the port attribute."""
+    return FakeFtpServer(user, password, files).start()
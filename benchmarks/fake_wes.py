@@ -0,0 +1,64 @@
+"""Local stand-in for WES devices, serving recorded payloads to the benchmarks.
+
+Each simulated device listens on its own port of the loopback interface.
+"""
+import asyncio
+import pathlib
+import socket
+
+from aiohttp import web
+
+PAYLOADS_DIR = pathlib.Path(__file__).parent.resolve().joinpath("payloads")
+DEFAULT_PAYLOAD = PAYLOADS_DIR.joinpath("mono_hc.xml")
+
+
+class FakeWesFarm:
+    """Serve the sensor file and accept AJAX commands for count devices."""
+
+    def __init__(self, count=1, payload=None, latency=0.0) -> None:
+        self.count = count
+        self.payload = payload if payload is not None else DEFAULT_PAYLOAD.read_bytes()
+        self.latency = latency
+        self.hosts = []
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._runner = None
+
+    async def _handle_sensor_file(self, request):
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return web.Response(body=self.payload, content_type="text/xml")
+        finally:
+            self.in_flight -= 1
+
+    async def _handle_ajax(self, request):
+        self.requests += 1
+        return web.Response(text="OK")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/homeassistant.cgx", self._handle_sensor_file)
+        app.router.add_get("/AJAX.CGX", self._handle_ajax)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        for _ in range(self.count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(("127.0.0.1", 0))
+            await web.SockSite(self._runner, sock).start()
+            self.hosts.append("127.0.0.1:%d" % sock.getsockname()[1])
+        return self
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def start_fake_wes(count=1, payload=None, latency=0.0):
+    """Start count simulated devices, their addresses are in the hosts attribute."""
+    return await FakeWesFarm(count, payload=payload, latency=latency).start()
@@ -0,0 +1,312 @@
+"""Local simulator of WES devices, for load and latency tests without the hardware.
+
+Each device starts from a recorded payload and renders the sensor files (the full
+template or the generated ones) with readings moving over time: clamp currents and
+powers, TIC power and indexes, probes. It enforces the Basic auth of its users, answers
+the INFOCFG.HTM admin check with 403 to non admin users, and applies the relay and
+virtual switch commands of AJAX.CGX.
+
+Latency, jitter, error rate and the number of requests served in parallel per device are
+configurable. Run from the repository root to serve devices to a Home Assistant instance:
+    python benchmarks/wes_simulator.py [--devices 1] [--port 8080] [--payload tri_tempo] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import contextlib
+import math
+import pathlib
+import random
+import re
+import socket
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).parent.resolve()
+sys.path.insert(0, str(ROOT.parent))
+
+from aiohttp import BasicAuth, hdrs, web  # noqa: E402
+
+from cartelectronic_wes.cgx import CGX_TEMPLATE_PATH, CgxTemplate  # noqa: E402
+from cartelectronic_wes.const import FILENAME_SENSOR_CGX, TIC_INDEX_LABELS  # noqa: E402
+from cartelectronic_wes.parser import PAYLOAD_ENCODING, parse_payload  # noqa: E402
+
+PAYLOADS_DIR = ROOT.joinpath("payloads")
+DEFAULT_PAYLOAD = PAYLOADS_DIR.joinpath("mono_hc.xml")
+# user: (password, admin)
+DEFAULT_USERS = {"admin": ("wes", True), "user": ("wes", False)}
+
+VALUE_PATTERN = re.compile(r"<(\w+)>([^<]*)</\1>")
+# Period (s) of the slow oscillation of the readings
+READING_PERIOD = 300
+
+
+class SimulatedWes:
+    """State of one device: the recorded values, moved a little on each render."""
+
+    def __init__(self, payload, seed=None) -> None:
+        self.values = {key: value for key, value in parse_payload(payload).as_dict().items() if value is not None}
+        self.base = dict(self.values)
+        self.random = random.Random(seed)
+        self.phase = self.random.uniform(0, 2 * math.pi)
+        self.last_update = time.time()
+
+    def _wave(self, now, amplitude, offset=0):
+        return 1 + amplitude * math.sin(2 * math.pi * now / READING_PERIOD + self.phase + offset)
+
+    def update(self, now):
+        """Move the readings to now, indexes grow with the power drawn since the last update."""
+        elapsed = max(now - self.last_update, 0)
+        self.last_update = now
+        values = self.values
+        voltage = values.get("clamps.V") or 230
+        for key, base in self.base.items():
+            block, _, label = key.rpartition(".")
+            if not isinstance(base, (int, float)) or not base:
+                continue
+            if block.startswith("clamps.clamp") and label == "I":
+                current = base * self._wave(now, 0.2, len(block)) * self.random.uniform(0.98, 1.02)
+                values[key] = current
+                power = current * voltage
+                text = values.get(f"{block}.power", "")
+                if text.endswith("VA"):
+                    values[f"{block}.power"] = f"{power:.0f} VA"
+                elif "cos phi" in text:
+                    cos_phi = float(text.rsplit(" ", 1)[-1])
+                    values[f"{block}.power"] = f"{power * cos_phi:.0f} W cos phi {cos_phi:.2f}"
+                    power *= cos_phi
+                if f"{block}.index" in values:
+                    values[f"{block}.index"] += power * elapsed / 3600000
+            elif block.startswith("tics.tic") and label == "PAP":
+                power = base * self._wave(now, 0.2)
+                values[key] = round(power)
+                if f"{block}.IINST" in values:
+                    values[f"{block}.IINST"] = round(power / voltage)
+                # The index of the running period, approximated by the largest one
+                indexes = [f"{block}.{index}" for index in TIC_INDEX_LABELS if self.base.get(f"{block}.{index}")]
+                if indexes:
+                    index = max(indexes, key=self.base.get)
+                    values[index] += power * elapsed / 3600
+            elif block == "probes":
+                values[key] = base + 0.5 * math.sin(2 * math.pi * now / READING_PERIOD + self.phase) + self.random.uniform(-0.05, 0.05)
+
+    def format(self, key, fmt, clock):
+        if key == "info.date":
+            return fmt % (clock.tm_mday, clock.tm_mon, clock.tm_year % 100)
+        if key == "info.time":
+            return fmt % (clock.tm_hour, clock.tm_min)
+        value = self.values.get(key)
+        if value is None:
+            return ""
+        if key == "info.serial":
+            return fmt % tuple(bytes.fromhex(value))
+        if isinstance(value, str):
+            # Texts are rendered as recorded, with the literal around %s
+            return value
+        try:
+            return fmt.replace("%l", "%") % value
+        except (TypeError, ValueError):
+            return str(value)
+
+    def render(self, template, now):
+        """Render the lines of a CGX template like the device."""
+        clock = time.localtime(now)
+        output = []
+        for line, keys, _, _ in template.lines:
+            body = line[line.find("<"):]
+            if keys:
+                fields = iter(keys)
+                body = VALUE_PATTERN.sub(
+                    lambda match: f"<{match.group(1)}>{self.format(next(fields), match.group(2), clock)}</{match.group(1)}>",
+                    body,
+                )
+            output.append(body)
+        return "\r\n".join(output).encode(PAYLOAD_ENCODING)
+
+    def command(self, params):
+        """Apply the relay and virtual switch commands of an AJAX request."""
+        for name, value in params.items():
+            if name == "frl":
+                key = f"relays.relay{value}.enabled"
+                self.values[key] = 1 - self.values.get(key, 0)
+            elif name == "fvs":
+                key = f"virtual_switch.switch{value}"
+                self.values[key] = 1 - self.values.get(key, 0)
+            elif name.startswith("rl"):
+                self.values[f"relays.relay{name[2:]}.enabled"] = int(value == "ON")
+            elif name.startswith("vs"):
+                self.values[f"virtual_switch.switch{name[2:]}"] = int(value == "ON")
+
+
+class WesSimulator:
+    """Serve count simulated devices, each on its own port of the loopback interface.
+
+    files maps the name of extra sensor files to their template, e.g. the files of a
+    stand-in FTP server, so generated files are rendered once uploaded.
+    """
+
+    def __init__(
+        self,
+        count=1,
+        port=0,
+        payload=None,
+        users=None,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        max_connections=None,
+        files=None,
+        seed=None,
+    ) -> None:
+        self.count = count
+        # Port of the first device, the next ones follow, 0 for free ports
+        self.port = port
+        self.payload = payload if payload is not None else DEFAULT_PAYLOAD.read_bytes()
+        self.users = users if users is not None else DEFAULT_USERS
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_connections = max_connections
+        self.files = files if files is not None else {}
+        self.random = random.Random(seed)
+        self.seed = seed
+        self.devices = []
+        self.hosts = []
+        self.requests = 0
+        self.commands = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._templates = {}
+        self._runners = []
+
+    def template(self, name):
+        """Return the parsed template of a sensor file, None if the device doesn't have it."""
+        if name == FILENAME_SENSOR_CGX:
+            content = CGX_TEMPLATE_PATH.read_bytes()
+        elif name in self.files:
+            content = self.files[name]
+        else:
+            return None
+        if content not in self._templates:
+            self._templates[content] = CgxTemplate(content.decode(PAYLOAD_ENCODING))
+        return self._templates[content]
+
+    def _authenticate(self, request):
+        """Return True for an admin, False for a user, None if not authenticated."""
+        header = request.headers.get(hdrs.AUTHORIZATION)
+        if header is None:
+            return None
+        try:
+            auth = BasicAuth.decode(header)
+        except ValueError:
+            return None
+        password, admin = self.users.get(auth.login, (None, False))
+        return admin if password is not None and password == auth.password else None
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        self.requests += 1
+        async with request.app["connections"]:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if self.error_rate and self.random.random() < self.error_rate:
+                    self.errors += 1
+                    return web.Response(status=500, text="Internal error")
+                admin = self._authenticate(request)
+                if admin is None:
+                    return web.Response(status=401, headers={hdrs.WWW_AUTHENTICATE: 'Basic realm="WES"'})
+                request["admin"] = admin
+                return await handler(request)
+            finally:
+                self.in_flight -= 1
+
+    async def _handle_admin_check(self, request):
+        if not request["admin"]:
+            return web.Response(status=403, text="Forbidden")
+        return web.Response(text="<html>INFOCFG</html>", content_type="text/html")
+
+    async def _handle_index(self, request):
+        return web.Response(text="<html>WES</html>", content_type="text/html")
+
+    async def _handle_ajax(self, request):
+        if not request["admin"]:
+            return web.Response(status=403, text="Forbidden")
+        self.commands += 1
+        request.app["device"].command(request.query)
+        return web.Response(text="OK")
+
+    async def _handle_file(self, request):
+        template = self.template(request.match_info["name"])
+        if template is None:
+            return web.Response(status=404, text="Not found")
+        device = request.app["device"]
+        now = time.time()
+        device.update(now)
+        return web.Response(body=device.render(template, now), content_type="text/xml")
+
+    async def start(self):
+        for number in range(self.count):
+            device = SimulatedWes(self.payload, seed=None if self.seed is None else self.seed + number)
+            app = web.Application(middlewares=[self._middleware])
+            app["device"] = device
+            app["connections"] = (
+                asyncio.Semaphore(self.max_connections) if self.max_connections else contextlib.nullcontext()
+            )
+            app.router.add_get("/INFOCFG.HTM", self._handle_admin_check)
+            app.router.add_get("/index.htm", self._handle_index)
+            app.router.add_get("/AJAX.CGX", self._handle_ajax)
+            app.router.add_get("/{name}", self._handle_file)
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(("127.0.0.1", self.port + number if self.port else 0))
+            await web.SockSite(runner, sock).start()
+            self._runners.append(runner)
+            self.devices.append(device)
+            self.hosts.append("127.0.0.1:%d" % sock.getsockname()[1])
+        return self
+
+    async def close(self):
+        for runner in self._runners:
+            await runner.cleanup()
+        self._runners = []
+
+
+async def start_simulator(count=1, port=0, **kwargs):
+    """Start count simulated devices, their addresses are in the hosts attribute."""
+    return await WesSimulator(count, port=port, **kwargs).start()
+
+
+async def main(args):
+    payload = PAYLOADS_DIR.joinpath(f"{args.payload}.xml").read_bytes()
+    simulator = await start_simulator(
+        args.devices,
+        port=args.port,
+        payload=payload,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        max_connections=args.max_connections,
+    )
+    print(f"Simulating {args.devices} WES on {', '.join(simulator.hosts)}, users {', '.join(simulator.users)}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await simulator.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8080, help="port of the first device, the next ones follow")
+    parser.add_argument("--payload", default="mono_hc", help="recorded payload the devices start from")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each answer")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random variation of the latency, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="ratio of requests answered with an error 500")
+    parser.add_argument("--max-connections", type=int, default=None, help="requests served in parallel per device")
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(main(parser.parse_args()))
@@ -1,18 +1,43 @@
 import logging
 
 from homeassistant import config_entries, core
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.const import (
     CONF_HOST,
     CONF_USERNAME,
     CONF_PASSWORD,
     CONF_DELAY,
+    CONF_WEBHOOK_ID,
     Platform
 )
+from homeassistant.components import webhook
 
-from .const import DOMAIN, FILENAME_SENSOR_CGX
+from .const import (
+    DOMAIN,
+    FILENAME_SENSOR_CGX,
+    CONF_FTP_USERNAME,
+    CONF_FTP_PASSWORD,
+    CONF_SLOW_INTERVAL,
+    CONF_MIN_INTERVAL,
+    CONF_MAX_INTERVAL,
+    CONF_PARSE_EXECUTOR,
+    CONF_PARSE_THRESHOLD,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_PARSE_EXECUTOR,
+    DEFAULT_PARSE_THRESHOLD,
+    DEFAULT_SLOW_INTERVAL,
+    CONF_CALIBRATION,
+    CONF_AGGREGATION_WINDOW,
+    DEFAULT_AGGREGATION_WINDOW,
+)
+from .cache import WesDataCache
+from .calibration import Calibration, parse_calibration
+from .cgx import CgxDeployer
+from .energy import WesEnergyStatistics
+from .push import async_register_push
 from .wes import WesApi
 from .coordinator import WesCoordinator
+from .hub import DATA_HUB, get_hub
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -21,28 +46,109 @@ async def async_setup_entry(
     hass: core.HomeAssistant, entry: config_entries.ConfigEntry
 ) -> bool:
     """Set up platform from a ConfigEntry."""
-    # session = async_get_clientsession(hass)
-    # api = WesApi(entry.data[CONF_HOST], user=entry.data[CONF_USERNAME], password=entry.data[CONF_PASSWORD], session=session, sensor_filename=FILENAME_SENSOR_CGX)
-    api = WesApi(entry.data[CONF_HOST], user=entry.data[CONF_USERNAME], password=entry.data[CONF_PASSWORD], sensor_filename=FILENAME_SENSOR_CGX)
+    if CONF_WEBHOOK_ID not in entry.data:
+        # Entries created before events could be pushed
+        hass.config_entries.async_update_entry(entry, data={**entry.data, CONF_WEBHOOK_ID: webhook.async_generate_id()})
+    # The api owns a keep-alive pool bounded per host rather than the shared session,
+    # the WES is slow to accept connections and to serve parallel requests
+    delay = entry.data.get(CONF_DELAY, 10)
+    # Status reads within the poll window are served from the last polled data
+    api = WesApi(entry.data[CONF_HOST], user=entry.data[CONF_USERNAME], password=entry.data[CONF_PASSWORD], sensor_filename=FILENAME_SENSOR_CGX, cache_ttl=delay)
+    try:
+        api.calibration = Calibration(parse_calibration(entry.options.get(CONF_CALIBRATION)))
+    except ValueError as e:
+        _LOGGER.warning(f"Calibration ignored: {e}")
     _LOGGER.info("Prepare coordinator for WES")
-    coordinator = WesCoordinator(hass, api, delay=entry.data.get(CONF_DELAY, 10))
-    await coordinator.async_config_entry_first_refresh()
+    coordinator = WesCoordinator(
+        hass,
+        api,
+        delay=delay,
+        min_interval=entry.options.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL),
+        max_interval=entry.options.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL),
+        aggregation_window=entry.options.get(CONF_AGGREGATION_WINDOW, DEFAULT_AGGREGATION_WINDOW),
+    )
+    get_hub(hass).register(
+        coordinator,
+        parse_executor=entry.options.get(CONF_PARSE_EXECUTOR, DEFAULT_PARSE_EXECUTOR),
+        parse_threshold=entry.options.get(CONF_PARSE_THRESHOLD, DEFAULT_PARSE_THRESHOLD),
+    )
+    cache = WesDataCache(hass, entry.entry_id)
+    data, device = await cache.async_load()
+    if data is None:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            await async_release_coordinator(hass, coordinator)
+            raise
+        _LOGGER.info("Set device property to retrive the wes serveur informations")
+        # Served from the data of the first refresh
+        await api.set_device_property()
+    else:
+        # Entities are created from the data of the last run, the WES is polled in background
+        _LOGGER.info("Start from the cached WES data")
+        api.device = device
+        coordinator.async_restore_data(data)
 
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
-    _LOGGER.info("Set device property to retrive the wes serveur informations")
-    await api.set_device_property()
-    # Forward the setup to the sensor platform.
-    hass.async_create_task(
-        hass.config_entries.async_forward_entry_setup(entry, Platform.SENSOR)
-    )
-    # Create switch object only if the specified user is admin
     if entry.data.get("is_admin"):
         _LOGGER.info("Configure web user is admin, enable relay control")
-        hass.async_create_task(
-            hass.config_entries.async_forward_entry_setup(entry, Platform.SWITCH)
+    await hass.config_entries.async_forward_entry_setups(entry, get_platforms(entry))
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    entry.async_on_unload(coordinator.async_add_listener(lambda: cache.async_save_later(coordinator)))
+    if coordinator.restored:
+        entry.async_create_background_task(hass, async_refresh_restored(coordinator), "cartelectronic_wes refresh")
+    # Relay and input changes pushed by the WES are applied at once, polling slows down
+    entry.async_on_unload(async_register_push(hass, entry, coordinator))
+    # Energy between polls, missed ones included, is spread into hourly statistics
+    energy_statistics = WesEnergyStatistics(hass, coordinator, entry.entry_id)
+    entry.async_on_unload(await energy_statistics.async_start())
+    # The full sensor file discovered the channels, poll files trimmed to the entities created
+    if CONF_FTP_USERNAME in entry.data:
+        deployer = CgxDeployer(
+            hass,
+            coordinator,
+            entry.data[CONF_FTP_USERNAME],
+            entry.data[CONF_FTP_PASSWORD],
+            slow_interval=entry.options.get(CONF_SLOW_INTERVAL, DEFAULT_SLOW_INTERVAL),
         )
-        hass.async_create_task(
-            hass.config_entries.async_forward_entry_setup(entry, Platform.BUTTON)
-        )
-    
+        entry.async_on_unload(deployer.async_listen_entity_registry(entry.entry_id))
+        entry.async_on_unload(deployer.async_shutdown)
+        entry.async_create_background_task(hass, deployer.async_deploy(), "cartelectronic_wes sensor file")
     return True
+
+
+async def async_refresh_restored(coordinator) -> None:
+    """Replace the cached data and device info by the ones of the WES."""
+    await coordinator.async_refresh()
+    if coordinator.last_update_success and coordinator.data.get("info.serial"):
+        await coordinator.api.set_device_property()
+
+
+async def async_reload_entry(hass: core.HomeAssistant, entry: config_entries.ConfigEntry) -> None:
+    """Reload the entry when its options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+def get_platforms(entry):
+    # Create switch object only if the specified user is admin
+    if entry.data.get("is_admin"):
+        return [Platform.SENSOR, Platform.BINARY_SENSOR, Platform.SWITCH, Platform.BUTTON]
+    return [Platform.SENSOR, Platform.BINARY_SENSOR]
+
+
+async def async_unload_entry(
+    hass: core.HomeAssistant, entry: config_entries.ConfigEntry
+) -> bool:
+    """Unload a ConfigEntry and close the connections to the WES."""
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, get_platforms(entry))
+    if unload_ok:
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await async_release_coordinator(hass, coordinator)
+    return unload_ok
+
+
+async def async_release_coordinator(hass: core.HomeAssistant, coordinator) -> None:
+    """Close the connections of a coordinator and remove it from the hub."""
+    if coordinator.hub is not None and coordinator.hub.unregister(coordinator):
+        hass.data.pop(DATA_HUB, None)
+    await coordinator.api.close()
@@ -0,0 +1,71 @@
+"""Aggregation of fast readings over a window, published once per window instead of on each poll."""
+from collections import deque
+
+# Peaks of the windows closed within this duration (s) are kept for the peak attributes
+PEAK_HORIZON = 24 * 3600
+
+
+class WindowAggregate:
+    """Min, max, time weighted mean and last value of a reading, computed on each sample.
+
+    The window is closed by close(), the value at that time is carried to the next one.
+    The max of each closed window is kept in a ring not increasing with time, so the peak of
+    the horizon is its first entry.
+    """
+
+    def __init__(self, horizon=PEAK_HORIZON) -> None:
+        self.horizon = horizon
+        self.last = None
+        self.min = None
+        self.max = None
+        self.samples = 0
+        self._integral = 0.0
+        self._start = None
+        self._last_time = None
+        # (max, close time) of the closed windows, max not increasing
+        self._peaks = deque()
+
+    def add(self, value, now):
+        """Add the reading value read at now (s)."""
+        if self.last is None:
+            self._start = now
+            self.min = self.max = value
+        else:
+            self._integral += self.last * (now - self._last_time)
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+        self.last = value
+        self._last_time = now
+        self.samples += 1
+
+    def close(self, now):
+        """Close the window at now (s), return its summary, None before the first reading."""
+        if self.last is None:
+            return None
+        integral = self._integral + self.last * (now - self._last_time)
+        duration = now - self._start
+        summary = {
+            "mean": integral / duration if duration > 0 else self.last,
+            "min": self.min,
+            "max": self.max,
+            "last": self.last,
+            "samples": self.samples,
+        }
+        peaks = self._peaks
+        # Equal peaks are kept, the first one stays the peak of the horizon while in it
+        while peaks and peaks[-1][0] < self.max:
+            peaks.pop()
+        peaks.append((self.max, now))
+        while peaks[0][1] <= now - self.horizon:
+            peaks.popleft()
+        # The next window starts from the value at close time
+        self.min = self.max = self.last
+        self.samples = 0
+        self._integral = 0.0
+        self._start = self._last_time = now
+        return summary
+
+    @property
+    def peak(self):
+        """Return (max, close time) of the highest window of the horizon, None before any."""
+        return self._peaks[0] if self._peaks else None
@@ -0,0 +1,60 @@
+"""Platform for binary sensor integration."""
+from __future__ import annotations
+
+import logging
+
+from homeassistant import config_entries, core
+from homeassistant.core import callback
+from homeassistant.components.binary_sensor import BinarySensorEntity
+from homeassistant.helpers.entity import DeviceInfo
+
+from .const import DOMAIN, SENSOR_ID_PREFIX, INPUT_COUNT
+from .entity import WesCoordinatorEntity
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(
+    hass: core.HomeAssistant,
+    config_entry: config_entries.ConfigEntry,
+    async_add_entities,
+):
+    """Setup binary sensors from a config entry created in the integrations UI."""
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
+    async_add_entities([InputBinarySensor(coordinator, i) for i in range(1, INPUT_COUNT + 1)])
+
+
+class InputBinarySensor(WesCoordinatorEntity, BinarySensorEntity):
+    _attr_has_entity_name = True
+    _attr_attribution = "WES from Cartelectronic"
+
+    def __init__(self, coordinator, id):
+        super().__init__(coordinator)
+        self.serial_number = coordinator.api.serial
+        self.__id = id
+        self._attr_name = f"input{self.__id}"
+        self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_input{self.__id}"
+        self.bind_field(f"intput.intput{self.__id}")
+        self._attr_is_on = None
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        device = self.coordinator.api.device
+        return DeviceInfo(
+            identifiers={
+                (DOMAIN, device.serial)
+            },
+            name=device.name,
+            manufacturer=device.manufacturer_name,
+            model=device.model,
+            sw_version=device.sw_version,
+            hw_version=device.hw_version
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        value = self.coordinator.data.value(self._field)
+        if value is not None and (value == 1) != self._attr_is_on:
+            self._attr_is_on = value == 1
+            self.async_write_ha_state()
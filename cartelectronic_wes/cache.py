@@ -0,0 +1,55 @@
+"""Last polled data and device info kept in Home Assistant storage, used to start without the WES."""
+import hashlib
+
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .snapshot import FLOAT_MISSING, SNAPSHOT_LAYOUT, restore_snapshot
+from .wes import WesDevice
+
+CACHE_STORAGE_VERSION = 1
+# Polled data changes often, it's written at most once per delay (s)
+CACHE_SAVE_DELAY = 300
+
+
+def layout_signature(layout=SNAPSHOT_LAYOUT):
+    """Return a digest of the snapshot layout, cached buffers of another layout are not restored."""
+    return hashlib.sha1("\n".join(layout.fields).encode()).hexdigest()
+
+
+class WesDataCache:
+    """Persist the last snapshot and device info of a WES."""
+
+    def __init__(self, hass, entry_id) -> None:
+        self._store = Store(hass, CACHE_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.cache")
+
+    async def async_load(self):
+        """Return the cached (snapshot, device), (None, None) without a usable cache."""
+        data = await self._store.async_load()
+        if not data or data.get("layout") != layout_signature():
+            return None, None
+        snapshot = restore_snapshot(
+            [FLOAT_MISSING if value is None else value for value in data["floats"]],
+            data["ints"],
+            data["texts"],
+            data["extra"],
+        )
+        device = WesDevice(**data["device"])
+        return snapshot, device
+
+    def async_save_later(self, coordinator):
+        """Write the data of coordinator once the save delay elapsed."""
+        self._store.async_delay_save(lambda: self._data_to_save(coordinator), CACHE_SAVE_DELAY)
+
+    def _data_to_save(self, coordinator):
+        snapshot = coordinator.data
+        device = coordinator.api.device
+        return {
+            "layout": layout_signature(),
+            # Missing (NaN) floats aren't valid JSON
+            "floats": [None if value != value else value for value in snapshot.floats],
+            "ints": list(snapshot.ints),
+            "texts": snapshot.texts,
+            "extra": snapshot.extra,
+            "device": {"serial": device.serial, "hw_version": device.hw_version, "sw_version": device.sw_version},
+        }
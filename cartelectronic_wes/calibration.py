@@ -0,0 +1,51 @@
+"""Scale and offset of channels, applied to the parsed snapshot before anything reads it."""
+from .snapshot import FIELD_FLOAT, SNAPSHOT_LAYOUT
+
+# Probes render 0.0 when not connected, it must stay 0.0 to be told apart from a reading
+ZERO_IS_MISSING_BLOCKS = ("probes.",)
+
+
+def parse_calibration(text):
+    """Return {key: (scale, offset)} of "key=scale,offset" entries separated by ";".
+
+    Raise ValueError on an unknown or non float key, or on a malformed entry.
+    """
+    factors = {}
+    for entry in (text or "").split(";"):
+        if not entry.strip():
+            continue
+        key, _, values = entry.partition("=")
+        key = key.strip()
+        field = SNAPSHOT_LAYOUT.fields.get(key)
+        if field is None or field.kind != FIELD_FLOAT:
+            raise ValueError(f"{key} is not a numeric channel")
+        scale, _, offset = values.partition(",")
+        factors[key] = (float(scale), float(offset or 0))
+    return factors
+
+
+class Calibration:
+    """Scale and offset of float fields by buffer index, applied in one pass over the snapshot."""
+
+    def __init__(self, factors, layout=SNAPSHOT_LAYOUT) -> None:
+        self.factors = [
+            (layout.fields[key].index, scale, offset, key.startswith(ZERO_IS_MISSING_BLOCKS))
+            for key, (scale, offset) in factors.items()
+        ]
+
+    def __bool__(self):
+        return bool(self.factors)
+
+    def apply(self, snapshot, fields=None):
+        """Calibrate the fields of a parsed snapshot, only the ones in fields when given.
+
+        fields is used for values set on a calibrated snapshot, e.g. pushed ones.
+        """
+        floats = snapshot.floats
+        for index, scale, offset, zero_is_missing in self.factors:
+            if fields is not None and index not in fields:
+                continue
+            value = floats[index]
+            # Missing values are NaN
+            if value == value and not (zero_is_missing and value == 0):
+                floats[index] = value * scale + offset
@@ -0,0 +1,204 @@
+"""Sensor file (CGX) templates rendered by the WES, trimmed to the fields used by the entities."""
+import hashlib
+import logging
+import pathlib
+import re
+
+from homeassistant.core import callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.debounce import Debouncer
+
+from .const import (
+    FILENAME_SENSOR_CGX,
+    CGX_TIER_FAST,
+    CGX_TIER_SLOW,
+    CGX_TIER_INFO,
+    CGX_TIERS,
+    FAST_TIER_LABELS,
+    FAST_TIER_BLOCKS,
+    DEFAULT_SLOW_INTERVAL,
+    INFO_TIER_INTERVAL,
+)
+from .parser import PAYLOAD_ENCODING
+from .snapshot import source_key
+from .wes import WesFtp, FTP_PORT
+
+_LOGGER = logging.getLogger(__name__)
+
+CGX_TEMPLATE_PATH = pathlib.Path(__file__).parent.resolve().joinpath(FILENAME_SENSOR_CGX)
+# Generated files are named after a digest of their content (8.3 name), e.g. ha1f2e3d.cgx
+CGX_GENERATED_PATTERN = re.compile(r"ha[0-9a-f]{6}\.cgx")
+# Wait for a burst of entity registry changes before generating the file again
+CGX_DEPLOY_COOLDOWN = 30
+
+TAG_PATTERN = re.compile(r"<(/?)(\w+)>")
+FIELD_PATTERN = re.compile(r"<(\w+)>[^<]*</\1>")
+
+
+class CgxTemplate:
+    """Template lines of a CGX file with the snapshot keys rendered by each command line.
+
+    Template lines (t) hold the structure of the document, command lines (c) render values.
+    """
+
+    def __init__(self, text) -> None:
+        # (line, keys rendered, tag opened or closed, True if closing)
+        self.lines = []
+        prefixes = []
+        for line in text.splitlines():
+            if line.startswith("c"):
+                start = line.find("<")
+                keys = tuple(".".join(prefixes[1:] + [tag]) for tag in FIELD_PATTERN.findall(line[start:]))
+                self.lines.append((line, keys, None, False))
+            elif match := TAG_PATTERN.search(line):
+                closing = bool(match.group(1))
+                if closing:
+                    prefixes.pop()
+                else:
+                    prefixes.append(match.group(2))
+                self.lines.append((line, (), match.group(2), closing))
+
+    @classmethod
+    def load(cls, path=CGX_TEMPLATE_PATH):
+        return cls(path.read_bytes().decode(PAYLOAD_ENCODING))
+
+    @property
+    def keys(self):
+        return [key for _, keys, _, _ in self.lines for key in keys]
+
+    def render(self, keys):
+        """Return the template restricted to the command lines rendering one of keys.
+
+        Blocks left without any value are dropped, the root element is always kept.
+        """
+        output = []
+        # Opening lines with a flag telling whether they have been written
+        opened = []
+        for line, line_keys, tag, closing in self.lines:
+            if tag is None:
+                if keys.isdisjoint(line_keys):
+                    continue
+                for block in opened:
+                    if not block[1]:
+                        output.append(block[0])
+                        block[1] = True
+                output.append(line)
+            elif closing:
+                _, written = opened.pop()
+                if written or not opened:
+                    output.append(line)
+            else:
+                opened.append([line, False])
+                if len(opened) == 1:
+                    output.append(line)
+                    opened[0][1] = True
+        return "\n".join(output)
+
+
+def field_tier(key):
+    """Return the polling tier of a snapshot key: fast moving values, device info or slow values."""
+    block, _, label = key.rpartition(".")
+    if key.startswith("info."):
+        return CGX_TIER_INFO
+    if label in FAST_TIER_LABELS or block.split(".", 1)[0] in FAST_TIER_BLOCKS:
+        return CGX_TIER_FAST
+    return CGX_TIER_SLOW
+
+
+def generated_filename(content):
+    """Return the versioned name of a generated file, changing with its content."""
+    return f"ha{hashlib.sha1(content.encode(PAYLOAD_ENCODING)).hexdigest()[:6]}.cgx"
+
+
+class CgxDeployer:
+    """Generate the sensor files of the entities in use, upload them and poll them instead of the full one.
+
+    Fields are split in one file per tier: the fast one is polled by the coordinator, the
+    slow and info ones at their own interval. The full template stays on the device to
+    discover the channels on setup.
+    """
+
+    def __init__(self, hass, coordinator, ftp_user, ftp_password, slow_interval=DEFAULT_SLOW_INTERVAL, ftp_port=FTP_PORT) -> None:
+        self.hass = hass
+        self.coordinator = coordinator
+        self.ftp_user = ftp_user
+        self.ftp_password = ftp_password
+        self.ftp_port = ftp_port
+        self.intervals = {CGX_TIER_FAST: 0, CGX_TIER_SLOW: slow_interval, CGX_TIER_INFO: INFO_TIER_INTERVAL}
+        self.template = None
+        self._debouncer = Debouncer(
+            hass, _LOGGER, cooldown=CGX_DEPLOY_COOLDOWN, immediate=False, function=self.async_deploy
+        )
+
+    def async_listen_entity_registry(self, entry_id):
+        """Deploy again when entities of the entry are disabled or removed."""
+        entity_registry = er.async_get(self.hass)
+
+        @callback
+        def entity_of_entry(event):
+            entity = entity_registry.async_get(event.data["entity_id"])
+            return event.data["action"] == "remove" or (entity is not None and entity.config_entry_id == entry_id)
+
+        async def entity_updated(event):
+            await self._debouncer.async_call()
+
+        return self.hass.bus.async_listen(er.EVENT_ENTITY_REGISTRY_UPDATED, entity_updated, event_filter=entity_of_entry)
+
+    def async_shutdown(self):
+        self._debouncer.async_cancel()
+
+    def render_files(self, keys, discovery_keys=()):
+        """Return the (filename, content, interval) of each tier holding some of keys.
+
+        Fields watched to discover channels getting in use are rendered in the slow tier, a probe
+        or channel getting in use gets its entity within the slow interval.
+        """
+        tiers = {}
+        for key in keys:
+            tiers.setdefault(field_tier(key), set()).add(key)
+        if discovery_keys:
+            tiers.setdefault(CGX_TIER_SLOW, set()).update(discovery_keys)
+        files = []
+        for tier in CGX_TIERS:
+            if tier in tiers:
+                content = self.template.render(tiers[tier])
+                files.append((generated_filename(content), content, self.intervals[tier]))
+        return files
+
+    async def async_deploy(self):
+        """Make the coordinator poll files rendering only the fields of its entities."""
+        api = self.coordinator.api
+        keys = {source_key(key) for key in self.coordinator.bound_keys()}
+        if not keys:
+            return
+        if self.template is None:
+            self.template = await self.hass.async_add_executor_job(CgxTemplate.load)
+        files = self.render_files(keys, self.coordinator.discovery_keys)
+        sensor_files = [(filename, interval) for filename, _, interval in files]
+        if sensor_files == api.sensor_files:
+            return
+        # A file is already on the device when the same entities were used before
+        uploads = [(filename, content) for filename, content, _ in files if not await api.has_file(f"/{filename}")]
+        if uploads:
+            filenames = {filename for filename, _ in sensor_files}
+            obsolete = [
+                filename for filename, _ in api.sensor_files
+                if CGX_GENERATED_PATTERN.fullmatch(filename) and filename not in filenames
+            ]
+            _LOGGER.info(f"Upload {', '.join(filename for filename, _ in uploads)} rendering {len(keys)} of {len(self.template.keys)} fields")
+            try:
+                wes_ftp = WesFtp(api.host, self.ftp_user, self.ftp_password, port=self.ftp_port)
+                await self.hass.async_add_executor_job(
+                    wes_ftp.upload_files,
+                    [(filename, content.encode(PAYLOAD_ENCODING)) for filename, content in uploads],
+                    obsolete,
+                )
+            except Exception as e:
+                _LOGGER.warning(f"Unable to upload the sensor files, keep polling {api.SENSOR_FILENAME}: {e}")
+                return
+            for filename, _ in uploads:
+                if await api.fetch_xml_data(f"/{filename}") is None:
+                    _LOGGER.warning(f"{filename} is not rendered by the WES, keep polling {api.SENSOR_FILENAME}")
+                    return
+        _LOGGER.debug(f"Poll {sensor_files} instead of {api.sensor_files}")
+        api.use_sensor_files(sensor_files)
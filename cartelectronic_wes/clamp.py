@@ -0,0 +1,42 @@
+"""Decoding of the power text rendered by the WES for each clamp."""
+import math
+
+from functools import lru_cache
+
+from .const import SENSOR_CLAMP_POWER_PATTERN
+
+
+@lru_cache(maxsize=256)
+def decode_power(text):
+    """Return (power, unit, cos phi) of "123 VA" or "456 W cos phi 0.98", None if not recognized.
+
+    cos phi is None for an apparent power (VA).
+    """
+    parts = text.split()
+    try:
+        if len(parts) == 2 and parts[1] == "VA":
+            return float(parts[0]), "VA", None
+        if len(parts) == 5 and parts[1] == "W" and parts[2:4] == ["cos", "phi"]:
+            return float(parts[0]), "W", float(parts[4])
+    except ValueError:
+        pass
+    # Unexpected spacing or extra text around the value
+    if match := SENSOR_CLAMP_POWER_PATTERN.search(text):
+        if match.group("va"):
+            return float(match.group("va")), "VA", None
+        return float(match.group("w")), "W", float(match.group("cos_phi"))
+    return None
+
+
+def power_values(text):
+    """Return the (real, apparent, reactive, cos phi) powers of a power text, None when unknown."""
+    decoded = decode_power(text)
+    if decoded is None:
+        return None, None, None, None
+    power, unit, cos_phi = decoded
+    if unit == "VA":
+        return None, power, None, None
+    if cos_phi <= 0:
+        return power, None, None, cos_phi
+    apparent = power / cos_phi
+    return power, apparent, math.sqrt(max(apparent * apparent - power * power, 0)), cos_phi
@@ -3,22 +3,28 @@ from __future__ import annotations
 import logging
 import pathlib
 
+from ftplib import Error as FtpError, error_perm
 from typing import Any, Dict, Optional
 
 from homeassistant import config_entries, core
+from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.const import (
     CONF_HOST,
     CONF_USERNAME,
     CONF_PASSWORD,
-    CONF_DELAY
+    CONF_DELAY,
+    CONF_WEBHOOK_ID
 )
+from homeassistant.components import webhook
 
 import voluptuous as vol
 
-from .const import DOMAIN, FILENAME_SENSOR_CGX
+from .const import DOMAIN, FILENAME_SENSOR_CGX, CONF_FTP_USERNAME, CONF_FTP_PASSWORD, CONF_CURRENT_DEADBAND, CONF_TEMPERATURE_DEADBAND, DEFAULT_DEADBANDS, CONF_MIN_INTERVAL, CONF_MAX_INTERVAL, DEFAULT_MIN_INTERVAL, DEFAULT_MAX_INTERVAL, CONF_PARSE_EXECUTOR, CONF_PARSE_THRESHOLD, DEFAULT_PARSE_EXECUTOR, DEFAULT_PARSE_THRESHOLD, PARSE_EXECUTORS, CONF_SLOW_INTERVAL, DEFAULT_SLOW_INTERVAL, CONF_CALIBRATION, CONF_AGGREGATION_WINDOW, DEFAULT_AGGREGATION_WINDOW
 
-from .wes import WesApi, WesFtp
+from .calibration import parse_calibration
+from .wes import WesApi, WesFtp, WesFtpError
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -42,10 +48,16 @@ class WesConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     # Home Assistant will call your migrate method if the version changes
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return WesOptionsFlow(config_entry)
+
     async def async_step_user(self, user_input: Optional[Dict[str, Any]] = None):
         errors: Dict[str, str] = {}
         if user_input is not None:
-            wes_api = WesApi(user_input[CONF_HOST], user=user_input[CONF_USERNAME], password=user_input[CONF_PASSWORD], sensor_filename=FILENAME_SENSOR_CGX)
+            session = async_get_clientsession(self.hass)
+            wes_api = WesApi(user_input[CONF_HOST], user=user_input[CONF_USERNAME], password=user_input[CONF_PASSWORD], session=session, sensor_filename=FILENAME_SENSOR_CGX)
             try:
                 is_admin = await wes_api.is_admin
                 if is_admin == True:
@@ -71,10 +83,59 @@ class WesConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             _LOGGER.info(f"Setup FTP on {self.data[CONF_HOST]}")
             sensor_file = local_directory.joinpath(FILENAME_SENSOR_CGX)
             wes_ftp = WesFtp(self.data[CONF_HOST], user_input[CONF_USERNAME], user_input[CONF_PASSWORD])
-            wes_ftp.upload_file(sensor_file)
-
-            return self.async_create_entry(title=f"WES {self.data[CONF_HOST]}", data=self.data)
+            try:
+                data = await self.hass.async_add_executor_job(sensor_file.read_bytes)
+                await self.hass.async_add_executor_job(wes_ftp.upload_files, [(sensor_file.name, data)])
+            except error_perm as e:
+                _LOGGER.warning(f"FTP login or upload refused: {e}")
+                errors["base"] = "invalid_auth"
+            except WesFtpError as e:
+                _LOGGER.warning(str(e))
+                errors["base"] = "upload_error"
+            except (OSError, EOFError, FtpError) as e:
+                _LOGGER.warning(f"Unable to reach the FTP server: {e}")
+                errors["base"] = "connection_error"
+            else:
+                # Kept to upload the sensor file trimmed to the entities in use
+                self.data[CONF_FTP_USERNAME] = user_input[CONF_USERNAME]
+                self.data[CONF_FTP_PASSWORD] = user_input[CONF_PASSWORD]
+                # Path of the webhook the WES pushes its events to
+                self.data[CONF_WEBHOOK_ID] = webhook.async_generate_id()
+                return self.async_create_entry(title=f"WES {self.data[CONF_HOST]}", data=self.data)
 
         return self.async_show_form(
             step_id="ftp", data_schema=FTP_AUTH_SCHEMA, errors=errors
-        )
\ No newline at end of file
+        )
+
+
+class WesOptionsFlow(config_entries.OptionsFlow):
+
+    def __init__(self, config_entry) -> None:
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input: Optional[Dict[str, Any]] = None):
+        errors: Dict[str, str] = {}
+        if user_input is not None:
+            try:
+                parse_calibration(user_input.get(CONF_CALIBRATION))
+            except ValueError as e:
+                _LOGGER.warning(f"Invalid calibration: {e}")
+                errors[CONF_CALIBRATION] = "invalid_calibration"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        options_schema = vol.Schema(
+            {
+                vol.Optional(CONF_CURRENT_DEADBAND, default=options.get(CONF_CURRENT_DEADBAND, DEFAULT_DEADBANDS[CONF_CURRENT_DEADBAND])): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(CONF_TEMPERATURE_DEADBAND, default=options.get(CONF_TEMPERATURE_DEADBAND, DEFAULT_DEADBANDS[CONF_TEMPERATURE_DEADBAND])): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(CONF_MIN_INTERVAL, default=options.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL)): vol.All(vol.Coerce(float), vol.Range(min=0.5)),
+                vol.Optional(CONF_MAX_INTERVAL, default=options.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL)): vol.All(vol.Coerce(float), vol.Range(min=1)),
+                vol.Optional(CONF_SLOW_INTERVAL, default=options.get(CONF_SLOW_INTERVAL, DEFAULT_SLOW_INTERVAL)): vol.All(vol.Coerce(float), vol.Range(min=1)),
+                vol.Optional(CONF_PARSE_EXECUTOR, default=options.get(CONF_PARSE_EXECUTOR, DEFAULT_PARSE_EXECUTOR)): vol.In(PARSE_EXECUTORS),
+                vol.Optional(CONF_PARSE_THRESHOLD, default=options.get(CONF_PARSE_THRESHOLD, DEFAULT_PARSE_THRESHOLD)): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(CONF_AGGREGATION_WINDOW, default=options.get(CONF_AGGREGATION_WINDOW, DEFAULT_AGGREGATION_WINDOW)): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(CONF_CALIBRATION, default=options.get(CONF_CALIBRATION, "")): cv.string,
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=options_schema, errors=errors)
@@ -8,11 +8,77 @@ SENSOR_CLAMP_POWER_PATTERN = re.compile("(?:(?:(?P<va>\d+) VA)|(?:(?P<w>\d+) W c
 SENSOR_ID_PREFIX = "wes_"
 
 FILENAME_SENSOR_CGX = "homeassistant.cgx"
+# FTP account used to upload the sensor files generated for the entities in use
+CONF_FTP_USERNAME = "ftp_username"
+CONF_FTP_PASSWORD = "ftp_password"
+# Generated sensor files are split in tiers: the fast one is polled each time, the others at their own interval
+CGX_TIER_FAST = "fast"
+CGX_TIER_SLOW = "slow"
+CGX_TIER_INFO = "info"
+CGX_TIERS = [CGX_TIER_FAST, CGX_TIER_SLOW, CGX_TIER_INFO]
+FAST_TIER_LABELS = ["I", "power", "PAP", "PAPIJ", "IINST", "IINST1", "IINST2", "IINST3", "PTEC"]
+FAST_TIER_BLOCKS = ["relays", "intput", "virtual_switch"]
+CONF_SLOW_INTERVAL = "slow_interval"
+DEFAULT_SLOW_INTERVAL = 60
+INFO_TIER_INTERVAL = 3600
 
-TIC_CONSUMPTION_INDEX_LABELS = ["BASE", "H_PLEINE", "EJPHN", "EJPHPM", "BBRHCJB", "BBRHPJB", "BBRHCJW", "BBRHPJW", "BBRHCJR", "BBRHPJR", "H_WeekEnd", "HC_Semaine", "HP_Semaine", "HC_WeekEnd", "HP_WeekEnd", "HC_Mercredi", "HP_Mercredi", "H_SUPER_CREUSE"]
+TIC_CONSUMPTION_INDEX_LABELS = ["BASE", "H_PLEINE", "H_CREUSE", "EJPHN", "EJPHPM", "BBRHCJB", "BBRHPJB", "BBRHCJW", "BBRHPJW", "BBRHCJR", "BBRHPJR", "H_WeekEnd", "HC_Semaine", "HP_Semaine", "HC_WeekEnd", "HP_WeekEnd", "HC_Mercredi", "HP_Mercredi", "H_SUPER_CREUSE"]
 TIC_PRODUCTION_INDEX_LABELS = ["PRODUCTEUR", "INJECTION"]
 TIC_INDEX_LABELS = TIC_CONSUMPTION_INDEX_LABELS + TIC_PRODUCTION_INDEX_LABELS
-TIC_SUBSCRIPTION_LABELS = ["OPTARIF", "ISOUSC", "PTEC", "DEMAIN"]
+TIC_SUBSCRIPTION_LABELS = ["OPTARIF", "ISOUSC", "PTEC", "DEMAIN", "PEJP"]
 TIC_APPARENT_POWER_LABELS = ["PAP", "PAPIJ"]
 TIC_INTENSITY_LABELS = ["IINST", "IINST1", "IINST2", "IINST3", "IMAX", "IMAX1", "IMAX2", "IMAX3"]
-TIC_VOLTAGE_LABELS = ["TENSION1", "TENSION2", "TENSION3"]
\ No newline at end of file
+TIC_VOLTAGE_LABELS = ["TENSION1", "TENSION2", "TENSION3"]
+# All labels rendered for a meter by homeassistant.cgx, in template order
+TIC_LABELS = ["ADCO", "OPTARIF", "ISOUSC", "PTEC", "PAP", "PAPIJ", "IINST", "IINST1", "IINST2", "IINST3", "TENSION1", "TENSION2", "TENSION3", "IMAX", "IMAX1", "IMAX2", "IMAX3", "PEJP", "DEMAIN", "BASE", "H_PLEINE", "H_CREUSE", "EJPHN", "EJPHPM", "BBRHCJB", "BBRHPJB", "BBRHCJW", "BBRHPJW", "BBRHCJR", "BBRHPJR", "H_WeekEnd", "HC_Semaine", "HP_Semaine", "HC_WeekEnd", "HP_WeekEnd", "HC_Mercredi", "HP_Mercredi", "H_SUPER_CREUSE", "PRODUCTEUR", "INJECTION"]
+INFO_FIELDS = ["date", "time", "hardware", "firmware", "serial", "storage"]
+CLAMP_FIELDS = ["enabled", "name", "power", "I", "index", "idxinject", "modinject"]
+# Numeric values decoded from the clamp power text, not rendered by the WES
+CLAMP_POWER_FIELDS = ["real_power", "apparent_power", "reactive_power", "cos_phi"]
+
+TIC_COUNT = 2
+CLAMP_COUNT = 4
+RELAY_COUNT = 2
+INPUT_COUNT = 2
+ANALOG_COUNT = 4
+PROBE_COUNT = 30
+VIRTUAL_SWITCH_COUNT = 24
+VARIABLE_COUNT = 8
+
+# Entity state is only written when the value moved by more than the dead-band
+CONF_CURRENT_DEADBAND = "current_deadband"
+CONF_TEMPERATURE_DEADBAND = "temperature_deadband"
+DEFAULT_DEADBANDS = {
+    CONF_CURRENT_DEADBAND: 0.1,
+    CONF_TEMPERATURE_DEADBAND: 0.2,
+}
+
+# Bounds of the adaptive poll interval, in seconds
+CONF_MIN_INTERVAL = "min_interval"
+CONF_MAX_INTERVAL = "max_interval"
+DEFAULT_MIN_INTERVAL = 1
+DEFAULT_MAX_INTERVAL = 60
+# Window (s) over which clamp currents and powers are aggregated before being written, 0 to write each change
+CONF_AGGREGATION_WINDOW = "aggregation_window"
+DEFAULT_AGGREGATION_WINDOW = 0
+# Variation between two polls above which the device is considered active
+ACTIVITY_THRESHOLDS = {
+    "I": 0.5,
+    "PAP": 100,
+    "IINST": 1,
+}
+
+# Where payloads are parsed: on the event loop, a worker thread or a worker process
+CONF_PARSE_EXECUTOR = "parse_executor"
+PARSE_EXECUTOR_INLINE = "inline"
+PARSE_EXECUTOR_THREAD = "thread"
+PARSE_EXECUTOR_PROCESS = "process"
+PARSE_EXECUTORS = [PARSE_EXECUTOR_INLINE, PARSE_EXECUTOR_THREAD, PARSE_EXECUTOR_PROCESS]
+DEFAULT_PARSE_EXECUTOR = PARSE_EXECUTOR_THREAD
+# Payloads smaller than this (bytes) are parsed on the event loop: a thread hand-off costs about
+# the parse of 1 KB (benchmarks/bench_parser.py), full sensor files (5 KB) go to the executor
+CONF_PARSE_THRESHOLD = "parse_threshold"
+DEFAULT_PARSE_THRESHOLD = 2048
+
+# Scale and offset of float channels, e.g. "analog.ad1=0.1,-5; probes.probe2=1,-0.4"
+CONF_CALIBRATION = "calibration"
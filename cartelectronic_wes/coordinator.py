@@ -1,19 +1,36 @@
-
 from datetime import timedelta
 
+import asyncio
 import logging
+import time
 
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 import async_timeout
 
+from .const import (
+    DEFAULT_DEADBANDS,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_AGGREGATION_WINDOW,
+    ACTIVITY_THRESHOLDS,
+)
+from .metrics import STAGE_POLL, STAGE_FAN_OUT
+from .scheduler import AdaptivePollInterval
+from .snapshot import FIELD_FLOAT, SNAPSHOT_LAYOUT, get_field
+
 
 _LOGGER = logging.getLogger(__name__)
 
 class WesCoordinator(DataUpdateCoordinator):
     """My custom coordinator."""
 
-    def __init__(self, hass, api, delay=10):
+    # Set once the missing poll offset support has been logged
+    _poll_offset_unsupported = False
+
+    def __init__(self, hass, api, delay=10, min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL, aggregation_window=DEFAULT_AGGREGATION_WINDOW):
         """Initialize my coordinator."""
         super().__init__(
             hass,
@@ -23,11 +40,228 @@ class WesCoordinator(DataUpdateCoordinator):
             update_interval=timedelta(seconds=delay),
         )
         self.api = api
+        # Set when registered on the WesHub scheduling the polls of all devices
+        self.hub = None
+        # Last snapshot sent to the listeners, None to notify all of them
+        self._notified_data = None
+        self._notified_success = True
+        self._availability_listeners = []
+        # Called after every update, whether fields changed or not
+        self._poll_listeners = []
+        # Called at the end of each aggregation window, 0 to publish fast readings on each change
+        self.aggregation_window = aggregation_window
+        self._window_listeners = []
+        self._window_unsub = None
+        # Fields set by a command, their listeners are updated on next poll even if unchanged
+        self._expected_fields = set()
+        # False when the data of the last poll was read before a command, it can't confirm it
+        self._data_confirms_commands = True
+        # True while data is the cached one of the last run, until the first successful poll
+        self.restored = False
+        # Fields of channels without entity yet, only watched to add their entity when used
+        self.discovery_keys = set()
+        self.poll_interval = AdaptivePollInterval(delay, min_interval, max_interval)
+        # Relays, inputs and virtual switches are active on any change
+        self._activity_fields = [
+            (field, ACTIVITY_THRESHOLDS.get(key.rsplit(".", 1)[-1], 0))
+            for key, field in SNAPSHOT_LAYOUT.fields.items()
+            if key.rsplit(".", 1)[-1] in ACTIVITY_THRESHOLDS or key.startswith(("relays.", "intput.", "virtual_switch."))
+        ]
+        api.add_command_listener(self.async_command_sent)
 
     async def _async_update_data(self):
         """Fetch data from API endpoint.
             # Note: asyncio.TimeoutError and aiohttp.ClientError are already
             # handled by the data update coordinator."""
-        async with async_timeout.timeout(10):
-            response_data = await self.api.fetch_sensor_data()
-            return response_data
\ No newline at end of file
+        metrics = self.api.metrics
+        metrics.polls += 1
+        start = time.perf_counter()
+        generation = self.api.sensor_data_generation
+        try:
+            if self.hub is not None:
+                async with self.hub.poll_slot():
+                    async with async_timeout.timeout(10):
+                        response_data = await self.api.fetch_sensor_data()
+            else:
+                async with async_timeout.timeout(10):
+                    response_data = await self.api.fetch_sensor_data()
+            if response_data is None:
+                raise UpdateFailed("No data retrieved from WES")
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.timeouts += 1
+            else:
+                metrics.errors += 1
+            self.update_interval = timedelta(seconds=self.poll_interval.on_error())
+            _LOGGER.debug("Poll failed, next one in %.1f s", self.update_interval.total_seconds())
+            raise
+        metrics.record(STAGE_POLL, time.perf_counter() - start)
+        self._data_confirms_commands = self.api.sensor_data_generation == generation
+        self.update_interval = timedelta(seconds=self.poll_interval.on_success(self.is_active(response_data)))
+        self.restored = False
+        return response_data
+
+    def set_poll_offset(self, offset):
+        """Set the sub-second offset (s) of the polls, scheduled on whole seconds plus this offset."""
+        # DataUpdateCoordinator._schedule_refresh polls at int(loop.time()) + _microsecond + interval,
+        # _microsecond being randomly drawn on init. It is private to Home Assistant: if it is renamed
+        # the polls keep a random offset, still bounded by the hub semaphore.
+        if not hasattr(self, "_microsecond"):
+            if not WesCoordinator._poll_offset_unsupported:
+                WesCoordinator._poll_offset_unsupported = True
+                _LOGGER.warning("Poll offsets not supported by this Home Assistant version, polls are not staggered")
+            return
+        self._microsecond = offset
+
+    @callback
+    def async_restore_data(self, data):
+        """Start from the data cached by the last run, without notifying listeners."""
+        self.data = data
+        self.restored = True
+
+    def is_active(self, data):
+        """Return True if power readings or channel states moved since the previous poll."""
+        previous = self.data
+        if previous is None:
+            return False
+        for field, threshold in self._activity_fields:
+            value = data.value(field)
+            old_value = previous.value(field)
+            if value is None or old_value is None:
+                continue
+            if abs(value - old_value) > threshold:
+                return True
+        return False
+
+    def bound_keys(self):
+        """Return the snapshot keys the entities are bound to."""
+        keys = {context.key for _, context in self._listeners.values() if context is not None}
+        return keys - self.discovery_keys
+
+    @callback
+    def async_expect_change(self, field):
+        """Confirm the optimistic state of field on the next poll, whether it changed or not."""
+        self._expected_fields.add(field)
+
+    @callback
+    def async_command_sent(self):
+        """Poll at the minimum interval for a while to catch the effect of a command.
+
+        The refresh is rescheduled on each command, so a burst of commands gets a single confirmation.
+        """
+        self.update_interval = timedelta(seconds=self.poll_interval.boost())
+        if self._listeners:
+            self._schedule_refresh()
+
+    @callback
+    def async_push_received(self):
+        """The device pushed an event, poll at the slow baseline while it keeps doing so."""
+        self.poll_interval.on_push()
+
+    @callback
+    def async_apply_push(self, values):
+        """Update the listeners with the raw values pushed by the device, by snapshot key."""
+        data = self.data.copy()
+        fields = [get_field(key) for key in values]
+        for field, text in zip(fields, values.values()):
+            data.set_value(field, text)
+        # Raw values, calibrated like the polled ones
+        if self.api.calibration:
+            self.api.calibration.apply(data, {field.index for field in fields if field.kind == FIELD_FLOAT})
+        # Status reads must not be served from the data polled before the event
+        self.api.invalidate_sensor_data()
+        self.api.invalidate_fields(fields)
+        self.async_set_updated_data(data)
+
+    def deadband(self, option):
+        """Return the dead-band configured in the entry options."""
+        options = self.config_entry.options if self.config_entry else {}
+        return options.get(option, DEFAULT_DEADBANDS.get(option, 0))
+
+    @callback
+    def async_add_availability_listener(self, update_callback):
+        """Listen for availability changes only, entities skip writes when their value is unchanged."""
+        self._availability_listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._availability_listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_add_poll_listener(self, update_callback):
+        """Listen for the end of every update, whether fields changed or not: metrics, energy counters."""
+        self._poll_listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._poll_listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_add_window_listener(self, update_callback):
+        """Listen for the end of the aggregation windows, a single timer serves all the listeners."""
+        self._window_listeners.append(update_callback)
+        if self._window_unsub is None:
+            self._window_unsub = async_track_time_interval(
+                self.hass, self._async_close_window, timedelta(seconds=self.aggregation_window)
+            )
+
+        @callback
+        def remove_listener() -> None:
+            self._window_listeners.remove(update_callback)
+            if not self._window_listeners and self._window_unsub is not None:
+                self._window_unsub()
+                self._window_unsub = None
+
+        return remove_listener
+
+    @callback
+    def _async_close_window(self, now) -> None:
+        for update_callback in list(self._window_listeners):
+            update_callback()
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Fan the update out to the listeners, timing it and counting the state writes."""
+        metrics = self.api.metrics
+        state_writes = metrics.state_writes
+        start = time.perf_counter()
+        self._async_fan_out()
+        metrics.record(STAGE_FAN_OUT, time.perf_counter() - start)
+        metrics.poll_state_writes = metrics.state_writes - state_writes
+        for update_callback in list(self._poll_listeners):
+            update_callback()
+
+    @callback
+    def _async_fan_out(self) -> None:
+        """Update only the listeners bound to a field which changed since the last update.
+
+        Listeners without context, and all of them on availability change, are always updated.
+        """
+        previous = self._notified_data
+        self._notified_data = self.data if self.last_update_success else None
+        if previous is None or not self.last_update_success:
+            super().async_update_listeners()
+            if self.last_update_success != self._notified_success:
+                self._notified_success = self.last_update_success
+                for update_callback in list(self._availability_listeners):
+                    update_callback()
+            return
+        # Expected fields wait for a poll started after the command
+        confirm = self._expected_fields and self._data_confirms_commands
+        if self.data is previous and not confirm:
+            # The payload was unchanged, the api returned the same snapshot
+            return
+        changed = self.data.changed_fields(previous)
+        if confirm:
+            changed |= self._expected_fields
+            self._expected_fields.clear()
+        if not changed:
+            return
+        _LOGGER.debug("%d fields changed since last update", len(changed))
+        for update_callback, context in list(self._listeners.values()):
+            if context is None or context in changed:
+                update_callback()
@@ -0,0 +1,24 @@
+"""Diagnostics of a WES config entry: poll metrics and polling setup."""
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME, CONF_WEBHOOK_ID
+
+from .const import DOMAIN, CONF_FTP_PASSWORD, CONF_FTP_USERNAME
+
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD, CONF_FTP_USERNAME, CONF_FTP_PASSWORD, CONF_WEBHOOK_ID}
+
+
+async def async_get_config_entry_diagnostics(hass, entry):
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    api = coordinator.api
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "last_update_success": coordinator.last_update_success,
+        "update_interval": coordinator.update_interval.total_seconds() if coordinator.update_interval else None,
+        "sensor_files": api.sensor_files,
+        "parse_executor": type(api.parse_executor).__name__ if api.parse_executor else None,
+        "parse_threshold": api.parse_threshold,
+        "metrics": api.metrics.as_dict(),
+    }
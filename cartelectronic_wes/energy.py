@@ -0,0 +1,199 @@
+"""Energy deltas between polls of the WES indexes, spread into hourly statistics."""
+import logging
+import time
+
+from homeassistant.const import UnitOfEnergy, UnitOfPower
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, TIC_INDEX_LABELS
+from .snapshot import get_field
+
+_LOGGER = logging.getLogger(__name__)
+
+HOUR = 3600
+# TIC indexes are rendered on 9 digits (Wh) and restart from 0 after 999999999
+TIC_INDEX_ROLLOVER = 10 ** 9
+# A decrease below this (Wh) is read jitter, not a counter reset
+INDEX_JITTER = 1
+ENERGY_STORAGE_VERSION = 1
+ENERGY_SAVE_DELAY = 60
+
+
+class EnergyCounter:
+    """Accumulate the energy measured by an index, robust to resets, rollovers and missed polls.
+
+    The delta between two polls is spread linearly over the time elapsed between them, so the
+    energy of a gap (restart, network outage) is split over the hours it covers.
+    """
+
+    def __init__(self, rollover=None) -> None:
+        self.rollover = rollover
+        self.index = None
+        self.time = None
+        # Energy (Wh) accumulated since the counter was created
+        self.total = 0.0
+        # Average power (W) between the last two polls
+        self.power = None
+        self.hour_start = None
+        self.hour_total = 0.0
+
+    def delta(self, index):
+        """Return the energy between the last index and index."""
+        delta = index - self.index
+        if delta >= 0 or -delta < INDEX_JITTER:
+            return max(delta, 0)
+        if self.rollover and -delta > self.rollover / 2:
+            _LOGGER.debug(f"Index rollover from {self.index} to {index}")
+            return index + self.rollover - self.index
+        # The counter restarted from zero (meter or WES replaced, index reset)
+        _LOGGER.debug(f"Index reset from {self.index} to {index}")
+        return index
+
+    def update(self, index, now):
+        """Account index read at now, return (hour start, total at hour end, hour energy) of completed hours."""
+        if self.index is None:
+            self.index = index
+            self.time = now
+            self.hour_start = now - now % HOUR
+            self.hour_total = self.total
+            return []
+        elapsed = now - self.time
+        if elapsed <= 0:
+            return []
+        delta = self.delta(index)
+        self.power = delta * HOUR / elapsed
+        hours = []
+        start = self.time
+        while now >= self.hour_start + HOUR:
+            end = self.hour_start + HOUR
+            self.total += delta * (end - start) / elapsed
+            hours.append((self.hour_start, self.total, self.total - self.hour_total))
+            self.hour_start = end
+            self.hour_total = self.total
+            start = end
+        self.total += delta * (now - start) / elapsed
+        self.index = index
+        self.time = now
+        return hours
+
+    def as_dict(self):
+        return {
+            "index": self.index,
+            "time": self.time,
+            "total": self.total,
+            "hour_start": self.hour_start,
+            "hour_total": self.hour_total,
+        }
+
+    @classmethod
+    def from_dict(cls, data, rollover=None):
+        counter = cls(rollover)
+        counter.index = data["index"]
+        counter.time = data["time"]
+        counter.total = data["total"]
+        counter.hour_start = data["hour_start"]
+        counter.hour_total = data["hour_total"]
+        return counter
+
+
+def index_keys(keys):
+    """Return the keys of keys which are energy indexes, with their rollover."""
+    indexes = {}
+    for key in keys:
+        label = key.rsplit(".", 1)[-1]
+        if key.startswith("tics.") and label in TIC_INDEX_LABELS:
+            indexes[key] = TIC_INDEX_ROLLOVER
+        elif key.startswith("clamps.") and label in ("index", "idxinject"):
+            indexes[key] = None
+    return indexes
+
+
+class WesEnergyStatistics:
+    """Feed the energy and average power of every index of the entities as hourly external statistics.
+
+    Counters are persisted, so the energy of a restart is spread over the hours it lasted.
+    """
+
+    def __init__(self, hass, coordinator, entry_id) -> None:
+        self.hass = hass
+        self.coordinator = coordinator
+        self.counters = {}
+        self._store = Store(hass, ENERGY_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.energy")
+
+    async def async_start(self):
+        """Restore the counters of the indexes bound by the entities and update them on every poll.
+
+        Return the unsubscribe callback.
+        """
+        stored = await self._store.async_load() or {}
+        for key, rollover in index_keys(self.coordinator.bound_keys()).items():
+            if key in stored:
+                self.counters[key] = EnergyCounter.from_dict(stored[key], rollover)
+            else:
+                self.counters[key] = EnergyCounter(rollover)
+        # Not field listeners: an index which didn't move books 0 Wh and closes its hour
+        remove_listener = self.coordinator.async_add_poll_listener(self._async_update)
+        # The current index closes the gap since the last run, cached data is older than the counters
+        self._async_update()
+
+        @callback
+        def stop():
+            remove_listener()
+            self.hass.async_create_task(self._store.async_save(self._data_to_save()))
+
+        return stop
+
+    def _data_to_save(self):
+        return {key: counter.as_dict() for key, counter in self.counters.items() if counter.index is not None}
+
+    def statistic_id(self, key, suffix):
+        object_id = f"{self.coordinator.api.serial}_{key.split('.', 1)[1].replace('.', '_')}_{suffix}"
+        return f"{DOMAIN}:{object_id.lower()}"
+
+    @callback
+    def _async_update(self):
+        """Account the indexes of the last poll, failed polls and restored data are skipped."""
+        coordinator = self.coordinator
+        if coordinator.data is None or coordinator.restored or not coordinator.last_update_success:
+            return
+        now = time.time()
+        for key, counter in self.counters.items():
+            index = coordinator.data.value(get_field(key))
+            if index is None:
+                continue
+            hours = counter.update(index, now)
+            if hours and "recorder" in self.hass.config.components:
+                self._async_add_statistics(key, hours)
+        self._store.async_delay_save(self._data_to_save, ENERGY_SAVE_DELAY)
+
+    @callback
+    def _async_add_statistics(self, key, hours):
+        from homeassistant.components.recorder.statistics import async_add_external_statistics
+
+        name = f"WES {key.split('.', 1)[1].replace('.', ' ')}"
+        energy_metadata = {
+            "has_mean": False,
+            "has_sum": True,
+            "name": f"{name} energy",
+            "source": DOMAIN,
+            "statistic_id": self.statistic_id(key, "energy"),
+            "unit_of_measurement": UnitOfEnergy.WATT_HOUR,
+        }
+        power_metadata = {
+            "has_mean": True,
+            "has_sum": False,
+            "name": f"{name} average power",
+            "source": DOMAIN,
+            "statistic_id": self.statistic_id(key, "power"),
+            "unit_of_measurement": UnitOfPower.WATT,
+        }
+        async_add_external_statistics(self.hass, energy_metadata, [
+            {"start": dt_util.utc_from_timestamp(start), "sum": total} for start, total, _ in hours
+        ])
+        # The energy of one hour in Wh is its average power in W
+        async_add_external_statistics(self.hass, power_metadata, [
+            {"start": dt_util.utc_from_timestamp(start), "mean": energy, "min": energy, "max": energy}
+            for start, _, energy in hours
+        ])
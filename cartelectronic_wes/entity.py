@@ -0,0 +1,70 @@
+"""Base entity bound to fields of the WES snapshot."""
+from homeassistant.core import callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN
+from .snapshot import get_field
+
+
+class WesCoordinatorEntity(CoordinatorEntity):
+    """Coordinator entity only notified when its snapshot field changed."""
+
+    # Option holding the dead-band of the entity value, None to write every change
+    _deadband_option = None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self.coordinator.async_add_availability_listener(self.async_write_ha_state))
+        # Only changed fields are fanned out, an entity added after a poll takes its current value now
+        if self.coordinator.data is not None:
+            self._handle_coordinator_update()
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        self.coordinator.api.metrics.state_writes += 1
+        super().async_write_ha_state()
+
+    def bind_field(self, key):
+        """Resolve the snapshot field of the entity, used as coordinator listener context."""
+        self._field = get_field(key)
+        self.coordinator_context = self._field
+        return self._field
+
+    def exceeds_deadband(self, value, previous):
+        """Return True if the new value moved far enough from the published one."""
+        # A channel going back to zero is always published
+        if previous is None or self._deadband_option is None or value == 0:
+            return value != previous
+        return abs(value - previous) >= self.coordinator.deadband(self._deadband_option)
+
+
+@callback
+def async_add_entities_in_use(coordinator, async_add_entities, domain, entities, in_use):
+    """Add the entities whose field value is in use or which are already registered.
+
+    The others are added by a later poll, as soon as their field value gets in use.
+    """
+    entity_registry = er.async_get(coordinator.hass)
+    entities_in_use = []
+    for entity in entities:
+        if in_use(coordinator.data.value(entity._field)) or entity_registry.async_get_entity_id(domain, DOMAIN, entity.unique_id):
+            entities_in_use.append(entity)
+        else:
+            _async_add_entity_when_used(coordinator, async_add_entities, entity, in_use)
+    async_add_entities(entities_in_use)
+
+
+@callback
+def _async_add_entity_when_used(coordinator, async_add_entities, entity, in_use):
+    key = entity._field.key
+    coordinator.discovery_keys.add(key)
+
+    @callback
+    def field_changed():
+        if in_use(coordinator.data.value(entity._field)):
+            remove_listener()
+            coordinator.discovery_keys.discard(key)
+            async_add_entities([entity])
+
+    remove_listener = coordinator.async_add_listener(field_changed, entity._field)
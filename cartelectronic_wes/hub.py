@@ -0,0 +1,82 @@
+"""Scheduling shared by all the WES configured in Home Assistant."""
+import asyncio
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from .const import PARSE_EXECUTOR_THREAD, PARSE_EXECUTOR_PROCESS, DEFAULT_PARSE_EXECUTOR, DEFAULT_PARSE_THRESHOLD
+
+DATA_HUB = "cartelectronic_wes_hub"
+
+# Polls running at the same time, all devices included
+HUB_MAX_CONCURRENT_POLLS = 4
+# Home Assistant schedules polls on whole seconds plus a sub-second offset of each coordinator,
+# each device gets its own offset, HUB_POLL_SPACING (s) apart within the range below
+HUB_POLL_SPACING = 0.02
+HUB_POLL_OFFSET_MIN = 0.05
+HUB_POLL_OFFSET_MAX = 0.5
+
+
+class WesHub:
+    """Stagger and bound the polls of every WES, parse payloads on a shared worker thread or process."""
+
+    def __init__(self, max_concurrent_polls=HUB_MAX_CONCURRENT_POLLS, poll_spacing=HUB_POLL_SPACING) -> None:
+        self.poll_spacing = poll_spacing
+        self._semaphore = asyncio.Semaphore(max_concurrent_polls)
+        # Staggering slot of each coordinator
+        self._slots = {}
+        self.coordinators = set()
+        self.executors = {}
+
+    def get_executor(self, kind):
+        """Return the shared executor of this kind, None to parse on the event loop."""
+        if kind not in (PARSE_EXECUTOR_THREAD, PARSE_EXECUTOR_PROCESS):
+            return None
+        if kind not in self.executors:
+            if kind == PARSE_EXECUTOR_PROCESS:
+                # Don't fork the whole Home Assistant process and its threads
+                self.executors[kind] = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self.executors[kind] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wes_parser")
+        return self.executors[kind]
+
+    def poll_offset(self, slot):
+        """Return the sub-second offset of the polls of a staggering slot."""
+        slots = int((HUB_POLL_OFFSET_MAX - HUB_POLL_OFFSET_MIN) / self.poll_spacing)
+        return HUB_POLL_OFFSET_MIN + (slot % slots) * self.poll_spacing
+
+    def register(self, coordinator, parse_executor=DEFAULT_PARSE_EXECUTOR, parse_threshold=DEFAULT_PARSE_THRESHOLD):
+        self.coordinators.add(coordinator)
+        coordinator.hub = self
+        # First free slot, devices due in the same second start their polls spaced apart
+        slot = min(set(range(len(self._slots) + 1)) - set(self._slots.values()))
+        self._slots[coordinator] = slot
+        coordinator.set_poll_offset(self.poll_offset(slot))
+        coordinator.api.parse_executor = self.get_executor(parse_executor)
+        coordinator.api.parse_threshold = parse_threshold
+
+    def unregister(self, coordinator):
+        """Forget a coordinator, return True when it was the last one."""
+        self.coordinators.discard(coordinator)
+        self._slots.pop(coordinator, None)
+        coordinator.hub = None
+        coordinator.api.parse_executor = None
+        if not self.coordinators:
+            for executor in self.executors.values():
+                executor.shutdown(wait=False)
+            self.executors.clear()
+        return not self.coordinators
+
+    @asynccontextmanager
+    async def poll_slot(self):
+        """Wait for the turn of a poll within the concurrency limit."""
+        async with self._semaphore:
+            yield
+
+
+def get_hub(hass):
+    """Return the hub of the integration, created with the first entry."""
+    if DATA_HUB not in hass.data:
+        hass.data[DATA_HUB] = WesHub()
+    return hass.data[DATA_HUB]
@@ -0,0 +1,103 @@
+"""Latency and volume metrics of the polls of a WES."""
+import bisect
+import math
+
+# Upper bounds (ms) of the latency histogram buckets, the last one is unbounded
+LATENCY_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, math.inf]
+
+# Stages of a poll, in order
+STAGE_CONNECT = "connect"
+STAGE_RESPONSE = "response"
+STAGE_BODY = "body"
+STAGE_PARSE = "parse"
+STAGE_POLL = "poll"
+STAGE_FAN_OUT = "fan_out"
+# Part of the parse run on the event loop, 0 when parsed on an executor
+STAGE_LOOP_BLOCKING = "loop_blocking"
+STAGES = [STAGE_CONNECT, STAGE_RESPONSE, STAGE_BODY, STAGE_PARSE, STAGE_LOOP_BLOCKING, STAGE_POLL, STAGE_FAN_OUT]
+
+
+class LatencyHistogram:
+    """Count of samples per latency bucket, with the last, mean and max values."""
+
+    def __init__(self) -> None:
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = None
+
+    def record(self, seconds):
+        value = seconds * 1000
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.last = value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, ratio):
+        """Return the ratio percentile interpolated within its bucket, None without sample."""
+        if not self.count:
+            return None
+        rank = ratio * self.count
+        seen = 0
+        lower = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            if count and seen + count >= rank:
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "last_ms": self.last,
+            "mean_ms": self.mean,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": self.max,
+            "buckets_ms": {str(bound): count for bound, count in zip(LATENCY_BUCKETS, self.buckets)},
+        }
+
+
+class WesMetrics:
+    """Per-stage latencies, payload size, failures and state writes of the polls of one WES."""
+
+    def __init__(self) -> None:
+        self.stages = {stage: LatencyHistogram() for stage in STAGES}
+        self.polls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.payload_size = None
+        self.payload_bytes = 0
+        # Payloads with the same values as the previous one, not parsed
+        self.unchanged_payloads = 0
+        self.state_writes = 0
+        # State writes of the last poll
+        self.poll_state_writes = 0
+
+    def record(self, stage, seconds):
+        self.stages[stage].record(seconds)
+
+    def record_payload(self, size):
+        self.payload_size = size
+        self.payload_bytes += size
+
+    def as_dict(self):
+        return {
+            "polls": self.polls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "payload_size": self.payload_size,
+            "payload_bytes": self.payload_bytes,
+            "unchanged_payloads": self.unchanged_payloads,
+            "state_writes": self.state_writes,
+            "poll_state_writes": self.poll_state_writes,
+            "stages": {stage: histogram.as_dict() for stage, histogram in self.stages.items()},
+        }
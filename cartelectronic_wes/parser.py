@@ -0,0 +1,106 @@
+"""Streaming parser for the homeassistant.cgx payload."""
+import codecs
+import hashlib
+import re
+import time
+
+from .snapshot import SNAPSHOT_LAYOUT
+
+# The WES doesn't always send a charset, latin-1 never fails to decode
+PAYLOAD_ENCODING = "ISO-8859-1"
+
+# Either a complete leaf (<I>1.23</I>) or an opening/closing container tag
+TOKEN_PATTERN = re.compile(r"<(\w+)>([^<]*)</\1>|<(/?)(\w+)>")
+# Root element of the CGX templates
+PAYLOAD_ROOT = "data"
+# Clock of the device, changing every minute whatever the measures
+CLOCK_PATTERN = re.compile(rb"<(date|time)>[^<]*</\1>")
+
+
+class WesPayloadParser:
+    """Incremental parser writing the CGX payload straight into a typed snapshot.
+
+    Leaves are identified by their dotted path below the root tag, e.g. ``clamps.clamp1.I``.
+    The template never splits an element over two lines, so only complete lines are
+    tokenized and the remainder is kept until the next chunk.
+    """
+
+    def __init__(self, encoding=PAYLOAD_ENCODING, layout=SNAPSHOT_LAYOUT) -> None:
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._pending = ""
+        self._prefixes = []
+        self.snapshot = layout.new_snapshot()
+        self.root = None
+        # Leaves of the layout read, none means the payload isn't a sensor file
+        self.fields_read = 0
+
+    def _parse(self, text):
+        snapshot = self.snapshot
+        fields = snapshot.layout.fields
+        prefixes = self._prefixes
+        prefix = prefixes[-1] if prefixes else ""
+        fields_read = 0
+        for leaf, value, closing, tag in TOKEN_PATTERN.findall(text):
+            if leaf:
+                key = prefix + leaf
+                field = fields.get(key)
+                if field is None:
+                    snapshot.extra[key] = value
+                else:
+                    snapshot.set_value(field, value)
+                    fields_read += 1
+            elif closing:
+                prefixes.pop()
+                prefix = prefixes[-1] if prefixes else ""
+            else:
+                # The root tag isn't part of the keys
+                if prefixes:
+                    prefix = f"{prefix}{tag}."
+                else:
+                    prefix = ""
+                    if self.root is None:
+                        self.root = tag
+                prefixes.append(prefix)
+        self.fields_read += fields_read
+
+    def feed(self, chunk):
+        text = self._pending + self._decoder.decode(chunk)
+        end = text.rfind("\n") + 1
+        self._pending = text[end:]
+        if end:
+            self._parse(text[:end])
+
+    def close(self):
+        """Finish parsing and return the snapshot.
+
+        Raise ValueError if the payload is truncated or isn't a sensor file (e.g. an error page).
+        """
+        text = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        self._parse(text)
+        if self._prefixes:
+            raise ValueError(f"Truncated payload, {self._prefixes[-1]!r} is not closed")
+        if self.root != PAYLOAD_ROOT:
+            raise ValueError(f"Not a sensor file, root is {self.root!r} instead of {PAYLOAD_ROOT!r}")
+        if not self.fields_read:
+            raise ValueError("Not a sensor file, no known field")
+        return self.snapshot
+
+
+def parse_payload(payload, encoding=PAYLOAD_ENCODING):
+    """Parse a complete payload (bytes) in one go."""
+    parser = WesPayloadParser(encoding)
+    parser.feed(payload)
+    return parser.close()
+
+
+def parse_payload_timed(payload, encoding=PAYLOAD_ENCODING):
+    """Parse payload, return the snapshot and the parse time (s), measured where it runs."""
+    start = time.perf_counter()
+    snapshot = parse_payload(payload, encoding)
+    return snapshot, time.perf_counter() - start
+
+
+def payload_digest(payload):
+    """Return a digest of the payload without the device clock, equal when the values are unchanged."""
+    return hashlib.sha1(CLOCK_PATTERN.sub(b"", payload)).digest()
@@ -0,0 +1,57 @@
+"""Events pushed by the WES to a webhook, applied without waiting for the next poll.
+
+The WES calls the URL on an event (relay or input change, threshold), either with the new
+values as snapshot keys in the query or form, e.g. ?relays.relay1.enabled=1, or without
+values to trigger an immediate poll.
+"""
+import logging
+
+from aiohttp import web
+
+from homeassistant.components import webhook
+from homeassistant.const import CONF_WEBHOOK_ID
+from homeassistant.core import callback
+from homeassistant.helpers.debounce import Debouncer
+
+from .const import DOMAIN
+from .snapshot import SNAPSHOT_LAYOUT
+
+_LOGGER = logging.getLogger(__name__)
+
+# Several events pushed at once (e.g. a scenario switching relays) trigger a single poll
+PUSH_REFRESH_COOLDOWN = 1
+
+
+@callback
+def async_register_push(hass, entry, coordinator):
+    """Register the webhook of the entry, return the callback unregistering it."""
+    webhook_id = entry.data[CONF_WEBHOOK_ID]
+    debouncer = Debouncer(
+        hass, _LOGGER, cooldown=PUSH_REFRESH_COOLDOWN, immediate=True, function=coordinator.async_refresh
+    )
+
+    async def handle_push(hass, webhook_id, request):
+        values = dict(request.query)
+        if request.method == "POST":
+            values.update(await request.post())
+        coordinator.async_push_received()
+        pushed = {key: value for key, value in values.items() if key in SNAPSHOT_LAYOUT.fields}
+        _LOGGER.debug(f"Event pushed by {coordinator.api.host}: {values}")
+        if pushed and coordinator.data is not None:
+            coordinator.async_apply_push(pushed)
+        else:
+            # Answer the device without waiting for the poll
+            hass.async_create_task(debouncer.async_call())
+        return web.Response(text="OK")
+
+    webhook.async_register(
+        hass, DOMAIN, entry.title, webhook_id, handle_push, local_only=True, allowed_methods=["GET", "POST"]
+    )
+    _LOGGER.info(f"WES events can be pushed to /api/webhook/{webhook_id}")
+
+    @callback
+    def unregister():
+        webhook.async_unregister(hass, webhook_id)
+        debouncer.async_cancel()
+
+    return unregister
@@ -0,0 +1,84 @@
+"""Adaptive delay between two polls of the WES."""
+import random
+import time
+
+# Polls stay at the minimum interval this long after a command
+COMMAND_BOOST_DURATION = 30
+# Growth of the interval on each poll without activity
+STABLE_BACKOFF = 1.25
+# Growth of the interval on each consecutive error, randomized by the jitter ratio
+ERROR_BACKOFF = 2
+ERROR_JITTER = 0.2
+# Relay and input changes are trusted to be pushed for this many push periods after the last event
+# pushed by the device. The period is the smoothed gap between pushes, at least the max interval
+# so a missing push is noticed within a few polls, and at most PUSH_PERIOD_MAX (s)
+PUSH_TRUST_PERIODS = 3
+PUSH_PERIOD_MAX = 3600
+
+
+class AdaptivePollInterval:
+    """Poll fast while the device is active or after a command, slow down when values are stable.
+
+    Errors and timeouts back off exponentially with jitter, always within min and max interval.
+    """
+
+    def __init__(self, interval, min_interval, max_interval) -> None:
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        self.base_interval = interval
+        self.interval = interval
+        self.errors = 0
+        self._boost_until = 0
+        self._last_push = None
+        self._push_period = None
+
+    def _bound(self, interval):
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def boost(self):
+        """A command was sent, poll at the minimum interval for a while."""
+        self._boost_until = time.monotonic() + COMMAND_BOOST_DURATION
+        self.interval = self.min_interval
+        return self.interval
+
+    def on_push(self):
+        """The device pushed an event, its state changes don't need to be polled while it keeps doing so."""
+        now = time.monotonic()
+        if self._last_push is not None:
+            gap = now - self._last_push
+            self._push_period = gap if self._push_period is None else (self._push_period + gap) / 2
+        self._last_push = now
+
+    def push_trusted(self, now):
+        """Return True if the last push is recent enough, trust is dropped once an expected push is missing."""
+        if self._last_push is None:
+            return False
+        period = min(max(self._push_period or 0, self.max_interval), PUSH_PERIOD_MAX)
+        if now - self._last_push <= PUSH_TRUST_PERIODS * period:
+            return True
+        # Relay and input changes are polled again, from the configured interval
+        self._last_push = None
+        self._push_period = None
+        self.interval = self.base_interval
+        return False
+
+    def on_success(self, active):
+        """Return the next interval after a successful poll."""
+        self.errors = 0
+        now = time.monotonic()
+        if active or now < self._boost_until:
+            self.interval = self.min_interval
+        elif self.push_trusted(now):
+            # Events are pushed, polling only refreshes the measures
+            self.interval = self.max_interval
+        else:
+            # Back to the configured interval first, then slow down while nothing moves
+            self.interval = self._bound(max(self.base_interval, self.interval * STABLE_BACKOFF))
+        return self.interval
+
+    def on_error(self):
+        """Return the next interval after a failed poll."""
+        self.errors += 1
+        backoff = self.base_interval * ERROR_BACKOFF ** min(self.errors, 10)
+        self.interval = self._bound(backoff * random.uniform(1 - ERROR_JITTER, 1 + ERROR_JITTER))
+        return self.interval
@@ -2,12 +2,14 @@
 from __future__ import annotations
 
 import logging
+import time
 
 from homeassistant import config_entries, core
 from homeassistant.core import callback
-from homeassistant.const import UnitOfElectricCurrent, UnitOfElectricPotential, UnitOfEnergy, UnitOfPower, UnitOfApparentPower
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.const import Platform, EntityCategory, UnitOfElectricCurrent, UnitOfElectricPotential, UnitOfEnergy, UnitOfPower, UnitOfApparentPower, UnitOfInformation, UnitOfTime, POWER_VOLT_AMPERE_REACTIVE
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.util import dt as dt_util
 from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorEntityDescription,
@@ -15,62 +17,121 @@ from homeassistant.components.sensor import (
     SensorStateClass
 )
 
-from .const import DOMAIN, SENSOR_CLAMP_POWER_PATTERN, SENSOR_ID_PREFIX, TIC_INDEX_LABELS, TIC_APPARENT_POWER_LABELS, TIC_INTENSITY_LABELS, TIC_VOLTAGE_LABELS
+from .const import DOMAIN, SENSOR_ID_PREFIX, TIC_INDEX_LABELS, TIC_COUNT, CLAMP_COUNT, PROBE_COUNT, ANALOG_COUNT, VARIABLE_COUNT, CONF_CURRENT_DEADBAND, CONF_TEMPERATURE_DEADBAND
+from .aggregate import WindowAggregate
+from .entity import WesCoordinatorEntity, async_add_entities_in_use
+from .metrics import STAGE_POLL, STAGE_RESPONSE, STAGE_PARSE, STAGE_LOOP_BLOCKING, STAGE_FAN_OUT
+from .snapshot import get_field
+from .tic import TARIFF_TEMPO, TARIFF_PERIODS, TEMPO_COLOURS, tariff_period, tempo_colour, tic_meter_model
 
 _LOGGER = logging.getLogger(__name__)
 
 
-def setup_tic_sensors(coordinator):
-    entities_sensors = list()
-    data = coordinator.data.get("tics")
-    for i in range(1, 3):
-        tic_data = data.get(f"tic{i}")
-        if tic_data["ADCO"] != "Pas Dispo":
-            for label in TIC_INDEX_LABELS:
-                try:
-                    index_value = tic_data[label]
-                    int_index_value = int(index_value)
-                    if int_index_value > 0:
-                        entities_sensors.append(TicIndexSensor(coordinator, i, label=label))
-                except IndexError:
-                    _LOGGER.warning(f"Unable to find index with label {label}")
-                except ValueError:
-                    _LOGGER.warning(f"Unable to parse index value for index {label}, value is {index_value}")
-            for label in TIC_APPARENT_POWER_LABELS:
-                entities_sensors.append(TicApparentPowerSensor(coordinator, i, label=label))
-            for label in TIC_INTENSITY_LABELS:
-                entities_sensors.append(TicIntensitySensor(coordinator, i, label=label))
-            for label in TIC_VOLTAGE_LABELS:
-                entities_sensors.append(TicVoltageSensor(coordinator, i, label=label))
+def setup_tic_sensors(coordinator, id, model):
+    """Return the sensors of the labels of the meter model."""
+    entities_sensors = [TicIndexSensor(coordinator, id, label=label) for label in model.index_labels]
+    entities_sensors += [TicApparentPowerSensor(coordinator, id, label=label) for label in model.apparent_power_labels]
+    entities_sensors += [TicIntensitySensor(coordinator, id, label=label) for label in model.intensity_labels]
+    entities_sensors += [TicVoltageSensor(coordinator, id, label=label) for label in model.voltage_labels]
+    entities_sensors += [TicSubscriptionTextSensor(coordinator, id, label=label) for label in model.subscription_labels]
+    entities_sensors.append(TicPeriodSensor(coordinator, id))
+    if model.tariff == TARIFF_TEMPO:
+        entities_sensors.append(TicTempoColourSensor(coordinator, id))
     return entities_sensors
-            
+
+
+@callback
+def async_add_tic_sensors(coordinator, config_entry, async_add_entities, id):
+    """Add the sensors of meter id, rebuilt when its contract or the meter changes.
+
+    Sensors of labels the meter doesn't report, registered by earlier versions or contracts, are removed.
+    """
+    entity_registry = er.async_get(coordinator.hass)
+    unique_id_prefix = f"{SENSOR_ID_PREFIX}{coordinator.api.serial}_tic{id}_"
+    model = None
+    entities = {}
+
+    @callback
+    def meter_changed():
+        nonlocal model, entities
+        new_model = tic_meter_model(coordinator.data, id)
+        # Kept while the meter is disconnected
+        if new_model is None or new_model == model:
+            return
+        if model is not None:
+            _LOGGER.info(f"TIC meter {id} is now {new_model.tariff} on {new_model.phases} phase(s), rebuild its sensors")
+        model = new_model
+        new_entities = {entity.unique_id: entity for entity in setup_tic_sensors(coordinator, id, model)}
+        for entity_id in [
+            entry.entity_id
+            for entry in er.async_entries_for_config_entry(entity_registry, config_entry.entry_id)
+            if entry.domain == Platform.SENSOR and entry.unique_id.startswith(unique_id_prefix) and entry.unique_id not in new_entities
+        ]:
+            # The entity removes itself with its registry entry
+            entity_registry.async_remove(entity_id)
+        async_add_entities([entity for unique_id, entity in new_entities.items() if unique_id not in entities])
+        entities = {unique_id: entities.get(unique_id, entity) for unique_id, entity in new_entities.items()}
+
+    meter_changed()
+    for label in ("ADCO", "OPTARIF"):
+        config_entry.async_on_unload(coordinator.async_add_listener(meter_changed, get_field(f"tics.tic{id}.{label}")))
 
 def setup_clamps_sensors(coordinator):
     entities_sensors = list()
-    data = coordinator.data.get("clamps")
-    if data.get("V"):
+    data = coordinator.data
+    if data.get("clamps.V"):
         entities_sensors.append(ClampVoltageSensor(coordinator))
-    for i in range(1, 5):
-        clamp_data = data.get(f"clamp{i}")
-        available = True if clamp_data["enabled"] == "1" else False
-        # Check if the power metric is apparent power or not
-        if match := SENSOR_CLAMP_POWER_PATTERN.match(clamp_data["power"]):
-            if match.group("va"):
-                entities_sensors.append(ClampPowerSensor(coordinator, id=i, available=available))
-            else:
-                entities_sensors.append(ClampPowerSensor(coordinator, id=i, apparent_power=False, available=available))
-        entities_sensors.append(ClampCurrentSensor(coordinator, i, available=available))
-        entities_sensors.append(ClampIndexSensor(coordinator, i, available=available))
-        entities_sensors.append(ClampIndexSensor(coordinator, i, inject=True, available=available))
+    for i in range(1, CLAMP_COUNT + 1):
+        available = True if data.get(f"clamps.clamp{i}.enabled") == 1 else False
+        kwargs = dict(available=available, enabled_default=available)
+        # The clamp measures the real power and cos phi, or only the apparent power
+        if data.get(f"clamps.clamp{i}.cos_phi") is not None:
+            entities_sensors.append(ClampPowerSensor(coordinator, id=i, apparent_power=False, **kwargs))
+            entities_sensors.append(ClampPowerSensor(coordinator, id=i, **kwargs))
+            entities_sensors.append(ClampReactivePowerSensor(coordinator, id=i, **kwargs))
+            entities_sensors.append(ClampPowerFactorSensor(coordinator, id=i, **kwargs))
+        elif data.get(f"clamps.clamp{i}.apparent_power") is not None:
+            entities_sensors.append(ClampPowerSensor(coordinator, id=i, **kwargs))
+        entities_sensors.append(ClampCurrentSensor(coordinator, i, **kwargs))
+        entities_sensors.append(ClampIndexSensor(coordinator, i, **kwargs))
+        entities_sensors.append(ClampIndexSensor(coordinator, i, inject=True, **kwargs))
             
     return entities_sensors
 
 def setup_1wire_probe(coordinator):
     entities_sensors = list()
-    for i in range(1, 31):
+    for i in range(1, PROBE_COUNT + 1):
         entities_sensors.append(Probe1WireSensor(coordinator, id=i))
     return entities_sensors
 
+def setup_channel_sensors(coordinator):
+    entities_sensors = [AnalogSensor(coordinator, id=i) for i in range(1, ANALOG_COUNT + 1)]
+    entities_sensors += [VariableSensor(coordinator, id=i) for i in range(1, VARIABLE_COUNT + 1)]
+    return entities_sensors
+
+def setup_metric_sensors(coordinator):
+    return [
+        WesLatencySensor(coordinator, STAGE_POLL, "poll latency"),
+        WesLatencySensor(coordinator, STAGE_RESPONSE, "response latency"),
+        WesLatencySensor(coordinator, STAGE_PARSE, "parse latency"),
+        WesLatencySensor(coordinator, STAGE_LOOP_BLOCKING, "parse loop blocking"),
+        WesLatencySensor(coordinator, STAGE_FAN_OUT, "fan-out latency"),
+        WesMetricSensor(coordinator, "payload size", "payload_size", UnitOfInformation.BYTES, SensorDeviceClass.DATA_SIZE),
+        WesMetricSensor(coordinator, "unchanged payloads", "unchanged_payloads", state_class=SensorStateClass.TOTAL_INCREASING),
+        WesMetricSensor(coordinator, "state writes per poll", "poll_state_writes"),
+        WesMetricSensor(coordinator, "poll errors", "errors", state_class=SensorStateClass.TOTAL_INCREASING),
+        WesMetricSensor(coordinator, "poll timeouts", "timeouts", state_class=SensorStateClass.TOTAL_INCREASING),
+    ]
+
+def probe_in_use(value):
+    # The WES renders 0.0 for a probe not connected
+    return bool(value)
+
+def channel_in_use(value):
+    # Analog inputs not wired and variables not set by the program stay at 0.0
+    return bool(value)
+
+
 async def async_setup_entry(
     hass: core.HomeAssistant,
     config_entry: config_entries.ConfigEntry,
@@ -78,26 +139,70 @@ async def async_setup_entry(
 ):
     """Setup sensors from a config entry created in the integrations UI."""
     coordinator = hass.data[DOMAIN][config_entry.entry_id]
-    # coordinator = WesCoordinator(hass, api)
-    await coordinator.async_config_entry_first_refresh()
 
     # Create sensors for clamp objects
     entities_sensors = setup_clamps_sensors(coordinator)
-    entities_sensors += setup_1wire_probe(coordinator)
-    entities_sensors += setup_tic_sensors(coordinator)
 
-    async_add_entities(entities_sensors)
+    entities_sensors += setup_metric_sensors(coordinator)
 
-class BaseWesSensor(CoordinatorEntity, SensorEntity):
+    async_add_entities(entities_sensors)
+    # TIC sensors follow the tariff option and phase count of each meter
+    for i in range(1, TIC_COUNT + 1):
+        async_add_tic_sensors(coordinator, config_entry, async_add_entities, i)
+    # Probes connected later are added by the poll which sees them
+    async_add_entities_in_use(coordinator, async_add_entities, Platform.SENSOR, setup_1wire_probe(coordinator), probe_in_use)
+    async_add_entities_in_use(coordinator, async_add_entities, Platform.SENSOR, setup_channel_sensors(coordinator), channel_in_use)
+
+class BaseWesSensor(WesCoordinatorEntity, SensorEntity):
     _attr_has_entity_name = True
     _attr_attribution = "WES from Cartelectronic"
+    # Readings aggregated over the window of the coordinator when it is set, rather than written on each change
+    _aggregated = False
+    _attr_extra_state_attributes = None
 
-    def __init__(self, coordinator, available=True, **kwargs):
+    def __init__(self, coordinator, available=True, enabled_default=True, **kwargs):
         """Pass coordinator to CoordinatorEntity."""
         super().__init__(coordinator)
         self.serial_number = coordinator.api.serial
         self._attr_available = available
+        # Disabled entities aren't rendered in the sensor file generated for the device
+        self._attr_entity_registry_enabled_default = enabled_default
         self._state = None
+        self._aggregate = WindowAggregate() if self._aggregated and coordinator.aggregation_window else None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        if self._aggregate is not None:
+            self.async_on_remove(self.coordinator.async_add_window_listener(self._handle_window_closed))
+
+    @callback
+    def add_reading(self, value) -> None:
+        """Add a reading to the aggregation window, the first one is written at once."""
+        self._aggregate.add(value, time.time())
+        if self._state is None:
+            self._state = value
+            self.async_write_ha_state()
+
+    @callback
+    def _handle_window_closed(self) -> None:
+        """Publish the mean of the readings of the window, min, max and peak as attributes."""
+        summary = self._aggregate.close(time.time())
+        if summary is None:
+            return
+        attributes = {
+            "min": summary["min"],
+            "max": summary["max"],
+            "last": summary["last"],
+        }
+        if peak := self._aggregate.peak:
+            attributes["peak"] = peak[0]
+            attributes["peak_time"] = dt_util.utc_from_timestamp(peak[1]).isoformat()
+        mean = round(summary["mean"], 3)
+        # A stable reading doesn't write the same state at each window
+        if self.exceeds_deadband(mean, self._state) or attributes != self._attr_extra_state_attributes:
+            self._state = mean
+            self._attr_extra_state_attributes = attributes
+            self.async_write_ha_state()
 
     @property
     def device_info(self) -> DeviceInfo:
@@ -127,6 +232,8 @@ class BaseClampSensor(BaseWesSensor):
 
 class ClampCurrentSensor(BaseClampSensor):
     _attr_native_unit_of_measurement = UnitOfElectricCurrent.AMPERE
+    _aggregated = True
+    _deadband_option = CONF_CURRENT_DEADBAND
 
     def __init__(self, coordinator, id=1, **kwargs):
         """Pass coordinator to CoordinatorEntity."""
@@ -134,14 +241,15 @@ class ClampCurrentSensor(BaseClampSensor):
         self.__id = id
         self._attr_name = f"clamp{self.__id} current"
         self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_clamp{self.__id}_current"
+        self.bind_field(f"clamps.clamp{self.__id}.I")
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        clamps_data = self.coordinator.data.get("clamps")
-        clamp_data = clamps_data.get(f"clamp{self.__id}")
-        if clamp_data:
-            entity_value = float(clamp_data.get(f"I"))
+        entity_value = self.coordinator.data.value(self._field)
+        if entity_value is not None and self._aggregate is not None:
+            self.add_reading(entity_value)
+        elif entity_value is not None and self.exceeds_deadband(entity_value, self._state):
             self._state = entity_value
             self.async_write_ha_state()
 
@@ -154,13 +262,13 @@ class ClampVoltageSensor(BaseClampSensor):
         super().__init__(coordinator, **kwargs)
         self._attr_name = f"main voltage"
         self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_main_voltage"
+        self.bind_field("clamps.V")
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        clamps_data = self.coordinator.data.get("clamps")
-        if clamps_data:
-            entity_value = int(clamps_data.get(f"V"))
+        entity_value = self.coordinator.data.value(self._field)
+        if entity_value is not None:
             self._state = entity_value
             self.async_write_ha_state()
 
@@ -180,26 +288,22 @@ class ClampIndexSensor(BaseClampSensor):
         else:
             self._attr_name = f"clamp{self.__id} consumption index"
             self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_clamp{self.__id}_consumption_index"
+        index_name = "idxinject" if self.inject else "index"
+        self.bind_field(f"clamps.clamp{self.__id}.{index_name}")
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        clamps_data = self.coordinator.data.get("clamps")
-        clamp_data = clamps_data.get(f"clamp{self.__id}")
-        if clamp_data:
-            if self.inject:
-                index_name = f"idxinject"
-            else:
-                index_name = f"index"
-            entity_value = float(clamp_data.get(index_name))
+        entity_value = self.coordinator.data.value(self._field)
+        if entity_value is not None:
             self._state = entity_value
             self.async_write_ha_state()
 
 class ClampPowerSensor(BaseClampSensor):
 
     _attr_state_class = SensorStateClass.MEASUREMENT
-
-    POWER_REGEXP = SENSOR_CLAMP_POWER_PATTERN
+    _aggregated = True
+    _attr_suggested_display_precision = 0
 
     def __init__(self, coordinator, id=1, apparent_power=True, **kwargs):
         """Pass coordinator to CoordinatorEntity."""
@@ -217,24 +321,48 @@ class ClampPowerSensor(BaseClampSensor):
             self._attr_device_class = SensorDeviceClass.POWER
             self._attr_name = f"clamp{self.__id} power"
             self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_clamp{self.__id}_power"
-    
+        # Decoded from the power text once per poll
+        self.bind_field(f"clamps.clamp{self.__id}.{'apparent_power' if self.apparent_power else 'real_power'}")
+
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        clamps_data = self.coordinator.data.get("clamps")
-        clamp_data = clamps_data.get(f"clamp{self.__id}")
-        if clamp_data:
-            if match := self.POWER_REGEXP.search(clamp_data["power"]):
-                value = match.groupdict()
-                if power_value := value.get("w"):
-                    self._state = power_value
-                    self.apparent_power = False
-                else:
-                    self._state = value.get("va")
+        entity_value = self.coordinator.data.value(self._field)
+        if entity_value is not None and self._aggregate is not None:
+            self.add_reading(entity_value)
+        elif entity_value is not None:
+            self._state = entity_value
             self.async_write_ha_state()
-            
+
+class ClampReactivePowerSensor(ClampPowerSensor):
+
+    def __init__(self, coordinator, id=1, **kwargs):
+        """Pass coordinator to CoordinatorEntity."""
+        super().__init__(coordinator, id=id, **kwargs)
+        self._attr_native_unit_of_measurement = POWER_VOLT_AMPERE_REACTIVE
+        self._attr_device_class = SensorDeviceClass.REACTIVE_POWER
+        self._attr_name = f"clamp{id} reactive power"
+        self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_clamp{id}_reactive_power"
+        self.bind_field(f"clamps.clamp{id}.reactive_power")
+
+class ClampPowerFactorSensor(ClampPowerSensor):
+    # The mean of cos phi over a window isn't the power factor of the window
+    _aggregated = False
+
+    def __init__(self, coordinator, id=1, **kwargs):
+        """Pass coordinator to CoordinatorEntity."""
+        super().__init__(coordinator, id=id, **kwargs)
+        self._attr_native_unit_of_measurement = None
+        self._attr_device_class = SensorDeviceClass.POWER_FACTOR
+        self._attr_suggested_display_precision = 2
+        self._attr_name = f"clamp{id} cos phi"
+        self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_clamp{id}_cos_phi"
+        self.bind_field(f"clamps.clamp{id}.cos_phi")
+
+
 class Probe1WireSensor(BaseWesSensor):
     _attr_state_class = SensorStateClass.MEASUREMENT
+    _deadband_option = CONF_TEMPERATURE_DEADBAND
 
     def __init__(self, coordinator, id=1, **kwargs):
         """Pass coordinator to CoordinatorEntity."""
@@ -242,31 +370,64 @@ class Probe1WireSensor(BaseWesSensor):
         self.__id = id
         self._attr_name = f"probe{self.__id}"
         self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_{self._attr_name}".lower()
+        self.bind_field(f"probes.probe{self.__id}")
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        clamps_data = self.coordinator.data.get("probes")
-        clamp_data = clamps_data.get(f"probe{self.__id}")
-        if clamp_data:
-            self._state = clamp_data
+        entity_value = self.coordinator.data.value(self._field)
+        if entity_value is not None and self.exceeds_deadband(entity_value, self._state):
+            self._state = entity_value
             self.async_write_ha_state()
 
+class BaseChannelSensor(BaseWesSensor):
+    """Numeric channel of the WES, calibrated when parsed."""
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_suggested_display_precision = 2
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        entity_value = self.coordinator.data.value(self._field)
+        if entity_value is not None and entity_value != self._state:
+            self._state = entity_value
+            self.async_write_ha_state()
+
+class AnalogSensor(BaseChannelSensor):
+
+    def __init__(self, coordinator, id=1, **kwargs):
+        """Pass coordinator to CoordinatorEntity."""
+        super().__init__(coordinator, **kwargs)
+        self.__id = id
+        self._attr_name = f"analog{self.__id}"
+        self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_analog{self.__id}"
+        self.bind_field(f"analog.ad{self.__id}")
+
+class VariableSensor(BaseChannelSensor):
+
+    def __init__(self, coordinator, id=1, **kwargs):
+        """Pass coordinator to CoordinatorEntity."""
+        super().__init__(coordinator, **kwargs)
+        self.__id = id
+        self._attr_name = f"variable{self.__id}"
+        self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_variable{self.__id}"
+        self.bind_field(f"variables.variable{self.__id}")
+
 class BaseTicSensor(BaseWesSensor):
     _attr_device_class = SensorDeviceClass.ENERGY
 
-    def __init__(self, coordinator, id, **kwargs):
+    def __init__(self, coordinator, id, label=None, **kwargs):
         """Pass coordinator to CoordinatorEntity."""
         super().__init__(coordinator, **kwargs)
         self.__id = id
+        self.label = label
+        self.bind_field(f"tics.tic{self.__id}.{self.label}")
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        clamps_data = self.coordinator.data.get("tics")
-        clamp_data = clamps_data.get(f"tic{self.__id}")
-        if clamp_data:
-            entity_value = int(clamp_data.get(self.label))
+        entity_value = self.coordinator.data.value(self._field)
+        if entity_value is not None:
             if entity_value != self._state:
                 self._state = entity_value
                 self.async_write_ha_state()
@@ -277,47 +438,88 @@ class TicIndexSensor(BaseTicSensor):
 
     def __init__(self, coordinator, id, label=None, **kwargs):
         """Pass coordinator to CoordinatorEntity."""
-        super().__init__(coordinator, id, **kwargs)
+        super().__init__(coordinator, id, label=label, **kwargs)
         self.__id = id
         self._state = None
-        self.label = label
         if self.label not in TIC_INDEX_LABELS:
             raise NotImplementedError(f"Label {self.label} is not supported yet, abort sensor creation")
         self._attr_name = f"tic{self.__id} {self.label} index"
         self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_tic{self.__id}_{self.label.lower()}_index"
 
 class TicSubscriptionTextSensor(BaseTicSensor):
+    """Contract label of the meter, written when it changes."""
+    _attr_device_class = None
+    _units = {"ISOUSC": UnitOfElectricCurrent.AMPERE, "PEJP": UnitOfTime.MINUTES}
 
     def __init__(self, coordinator, id, label=None, **kwargs):
         """Pass coordinator to CoordinatorEntity."""
-        super().__init__(coordinator, id, **kwargs)
+        super().__init__(coordinator, id, label=label, **kwargs)
         self.__id = id
         self._state = None
-        self.label = label
         self._attr_name = f"tic{self.__id} {self.label}"
         self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_tic{self.__id}_{self.label.lower()}"
+        self._attr_native_unit_of_measurement = self._units.get(self.label)
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        clamps_data = self.coordinator.data.get("tics")
-        clamp_data = clamps_data.get(f"tic{self.__id}")
-        if clamp_data:
-            entity_value = clamp_data.get(self.label) # Avoid to parse the value as integer
+        entity_value = self.coordinator.data.value(self._field)
+        if entity_value is not None:
             if entity_value != self._state:
                 self._state = entity_value
                 self.async_write_ha_state()
 
+class TicPeriodSensor(BaseTicSensor):
+    """Current tariff period decoded from PTEC, with the Tempo colour of the day."""
+    _attr_device_class = SensorDeviceClass.ENUM
+    _attr_options = list(TARIFF_PERIODS.values())
+
+    def __init__(self, coordinator, id, **kwargs):
+        """Pass coordinator to CoordinatorEntity."""
+        super().__init__(coordinator, id, label="PTEC", **kwargs)
+        self.__id = id
+        self._attr_name = f"tic{self.__id} tariff period"
+        self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_tic{self.__id}_tariff_period"
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator, only called when PTEC changed."""
+        period, colour = tariff_period(self.coordinator.data.value(self._field))
+        attributes = {"tempo_colour": colour} if colour else None
+        if period is not None and (period != self._state or attributes != self._attr_extra_state_attributes):
+            self._state = period
+            self._attr_extra_state_attributes = attributes
+            self.async_write_ha_state()
+
+class TicTempoColourSensor(BaseTicSensor):
+    """Tempo colour of tomorrow decoded from DEMAIN, unknown until announced."""
+    _attr_device_class = SensorDeviceClass.ENUM
+    _attr_options = TEMPO_COLOURS
+
+    def __init__(self, coordinator, id, **kwargs):
+        """Pass coordinator to CoordinatorEntity."""
+        super().__init__(coordinator, id, label="DEMAIN", **kwargs)
+        self.__id = id
+        self._attr_name = f"tic{self.__id} tomorrow colour"
+        self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_tic{self.__id}_tomorrow_colour"
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator, only called when DEMAIN changed."""
+        entity_value = self.coordinator.data.value(self._field)
+        if entity_value is not None and tempo_colour(entity_value) != self._state:
+            self._state = tempo_colour(entity_value)
+            self.async_write_ha_state()
+
 class TicApparentPowerSensor(BaseTicSensor):
     _attr_native_unit_of_measurement = UnitOfApparentPower.VOLT_AMPERE
     _attr_device_class = SensorDeviceClass.APPARENT_POWER
 
     def __init__(self, coordinator, id, label=None, **kwargs):
         """Pass coordinator to CoordinatorEntity."""
-        super().__init__(coordinator, id, **kwargs)
+        super().__init__(coordinator, id, label=label, **kwargs)
         self.__id = id
         self._state = None
-        self.label = label
         self._attr_name = f"tic{self.__id} {self.label}"
         self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_tic{self.__id}_{self.label.lower()}"
 
@@ -327,10 +529,9 @@ class TicIntensitySensor(BaseTicSensor):
 
     def __init__(self, coordinator, id, label=None, **kwargs):
         """Pass coordinator to CoordinatorEntity."""
-        super().__init__(coordinator, id, **kwargs)
+        super().__init__(coordinator, id, label=label, **kwargs)
         self.__id = id
         self._state = None
-        self.label = label
         self._attr_name = f"tic{self.__id} {self.label}"
         self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_tic{self.__id}_{self.label.lower()}"
 
@@ -340,14 +541,56 @@ class TicVoltageSensor(BaseTicSensor):
 
     def __init__(self, coordinator, id, label=None, **kwargs):
         """Pass coordinator to CoordinatorEntity."""
-        super().__init__(coordinator, id, **kwargs)
+        super().__init__(coordinator, id, label=label, **kwargs)
         self.__id = id
         self._state = None
-        self.label = label
         self._attr_name = f"tic{self.__id} {self.label}"
         self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_tic{self.__id}_{self.label.lower()}"
 
 
+class WesMetricSensor(SensorEntity):
+    """Diagnostic sensor publishing a metric of the polls, updated after every poll."""
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, coordinator, name, attribute, unit=None, device_class=None, state_class=SensorStateClass.MEASUREMENT):
+        self.coordinator = coordinator
+        self.metrics = coordinator.api.metrics
+        self.attribute = attribute
+        self._attr_name = name
+        self._attr_unique_id = f"{SENSOR_ID_PREFIX}{coordinator.api.serial}_metrics_{attribute}".lower()
+        self._attr_native_unit_of_measurement = unit
+        self._attr_device_class = device_class
+        self._attr_state_class = state_class
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, coordinator.api.device.serial)})
+
+    async def async_added_to_hass(self) -> None:
+        # Not a coordinator listener: published even when no field changed, and not counted in the state writes
+        self.async_on_remove(self.coordinator.async_add_poll_listener(self.async_write_ha_state))
+
+    @property
+    def native_value(self):
+        return getattr(self.metrics, self.attribute)
+
+class WesLatencySensor(WesMetricSensor):
+    _attr_suggested_display_precision = 1
+
+    def __init__(self, coordinator, stage, name):
+        super().__init__(coordinator, name, f"{stage}_latency", UnitOfTime.MILLISECONDS, SensorDeviceClass.DURATION)
+        self.histogram = self.metrics.stages[stage]
+
+    @property
+    def native_value(self):
+        return self.histogram.last
+
+    @property
+    def extra_state_attributes(self):
+        attributes = self.histogram.as_dict()
+        del attributes["buckets_ms"], attributes["last_ms"]
+        return attributes
+
 # class TicProductionIndexSensor(BaseTicSensor):
 #     _attr_native_unit_of_measurement = UnitOfEnergy.WATT_HOUR
 #     _attr_state_class = SensorStateClass.TOTAL_INCREASING
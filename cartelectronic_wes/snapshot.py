@@ -0,0 +1,276 @@
+"""Compact, typed snapshot of the homeassistant.cgx payload."""
+from array import array
+from typing import NamedTuple
+
+from .clamp import power_values
+from .const import (
+    TIC_LABELS,
+    TIC_INDEX_LABELS,
+    TIC_APPARENT_POWER_LABELS,
+    TIC_INTENSITY_LABELS,
+    TIC_VOLTAGE_LABELS,
+    INFO_FIELDS,
+    CLAMP_FIELDS,
+    CLAMP_POWER_FIELDS,
+    TIC_COUNT,
+    CLAMP_COUNT,
+    RELAY_COUNT,
+    INPUT_COUNT,
+    ANALOG_COUNT,
+    PROBE_COUNT,
+    VIRTUAL_SWITCH_COUNT,
+    VARIABLE_COUNT,
+)
+
+# Converter for each leaf tag, trailing channel digits are stripped (probe12 -> probe)
+# Tags missing from this table are kept as raw text
+FIELD_CONVERTERS = {
+    # info
+    "date": str,
+    "time": str,
+    "hardware": str,
+    "firmware": str,
+    "serial": str,
+    "storage": float,
+    # tics
+    "ADCO": str,
+    "OPTARIF": str,
+    "PTEC": str,
+    "DEMAIN": str,
+    "ISOUSC": int,
+    "PEJP": int,
+    "H_CREUSE": int,
+    # clamps
+    "enabled": int,
+    "name": str,
+    "power": str,
+    "I": float,
+    "index": float,
+    "idxinject": float,
+    "modinject": int,
+    "V": int,
+    "real_power": float,
+    "apparent_power": float,
+    "reactive_power": float,
+    "cos_phi": float,
+    # intput, analog, probes, virtual_switch, variables
+    "intput": int,
+    "ad": float,
+    "probe": float,
+    "switch": int,
+    "variable": float,
+}
+for _label in TIC_INDEX_LABELS + TIC_APPARENT_POWER_LABELS + TIC_INTENSITY_LABELS + TIC_VOLTAGE_LABELS:
+    FIELD_CONVERTERS.setdefault(_label, int)
+
+_CHANNEL_DIGITS = "0123456789"
+
+FIELD_FLOAT = 0
+FIELD_INT = 1
+FIELD_TEXT = 2
+_FIELD_KINDS = {float: FIELD_FLOAT, int: FIELD_INT, str: FIELD_TEXT}
+
+# Stored in the buffers when a value is absent or can't be parsed ("Pas Dispo")
+FLOAT_MISSING = float("nan")
+INT_MISSING = -(2 ** 63)
+
+
+def get_converter(tag):
+    """Return the converter of a leaf tag."""
+    converter = FIELD_CONVERTERS.get(tag)
+    if converter is None:
+        converter = FIELD_CONVERTERS.get(tag.rstrip(_CHANNEL_DIGITS), str)
+    return converter
+
+
+class SnapshotField(NamedTuple):
+    """Position of a field in the snapshot buffer of its kind."""
+    key: str
+    kind: int
+    index: int
+
+
+def snapshot_keys():
+    """Keys of every field rendered by homeassistant.cgx, in template order."""
+    keys = [f"info.{field}" for field in INFO_FIELDS]
+    for i in range(1, TIC_COUNT + 1):
+        keys += [f"tics.tic{i}.{label}" for label in TIC_LABELS]
+    for i in range(1, CLAMP_COUNT + 1):
+        keys += [f"clamps.clamp{i}.{field}" for field in CLAMP_FIELDS]
+    keys.append("clamps.V")
+    keys += [f"relays.relay{i}.enabled" for i in range(1, RELAY_COUNT + 1)]
+    keys += [f"intput.intput{i}" for i in range(1, INPUT_COUNT + 1)]
+    keys += [f"analog.ad{i}" for i in range(1, ANALOG_COUNT + 1)]
+    keys += [f"probes.probe{i}" for i in range(1, PROBE_COUNT + 1)]
+    keys += [f"virtual_switch.switch{i}" for i in range(1, VIRTUAL_SWITCH_COUNT + 1)]
+    keys += [f"variables.variable{i}" for i in range(1, VARIABLE_COUNT + 1)]
+    return keys
+
+
+def decoded_fields():
+    """Return the fields decoded from a rendered one, as {source key: (decoder, decoded keys)}.
+
+    The decoder returns one value per decoded key, None to leave it missing.
+    """
+    return {
+        f"clamps.clamp{i}.power": (power_values, [f"clamps.clamp{i}.{field}" for field in CLAMP_POWER_FIELDS])
+        for i in range(1, CLAMP_COUNT + 1)
+    }
+
+
+class SnapshotLayout:
+    """Fixed position of every field: floats, integers and texts each get one contiguous buffer."""
+
+    def __init__(self, keys, decoded=None) -> None:
+        decoded = decoded or {}
+        keys = list(keys) + [key for _, decoded_keys in decoded.values() for key in decoded_keys]
+        self.fields = {}
+        # Fields of each kind by buffer index
+        self.fields_by_kind = ([], [], [])
+        for key in keys:
+            kind = _FIELD_KINDS[get_converter(key.rsplit(".", 1)[-1])]
+            kind_fields = self.fields_by_kind[kind]
+            field = SnapshotField(key, kind, len(kind_fields))
+            self.fields[key] = field
+            kind_fields.append(field)
+        # Decoded once per snapshot when the source text is set
+        self.decoders = {
+            self.fields[key]: (decoder, [self.fields[decoded_key] for decoded_key in decoded_keys])
+            for key, (decoder, decoded_keys) in decoded.items()
+        }
+        self.sources = {decoded_key: key for key, (_, decoded_keys) in decoded.items() for decoded_key in decoded_keys}
+        sizes = [len(kind_fields) for kind_fields in self.fields_by_kind]
+        self._floats = array("d", [FLOAT_MISSING]) * sizes[FIELD_FLOAT]
+        self._ints = array("q", [INT_MISSING]) * sizes[FIELD_INT]
+        self._texts = [None] * sizes[FIELD_TEXT]
+
+    def new_snapshot(self):
+        return WesSnapshot(self, array("d", self._floats), array("q", self._ints), list(self._texts))
+
+
+SNAPSHOT_LAYOUT = SnapshotLayout(snapshot_keys(), decoded_fields())
+
+
+def get_field(key):
+    """Return the precomputed position of a field, entities resolve it once at creation."""
+    return SNAPSHOT_LAYOUT.fields[key]
+
+
+def source_key(key):
+    """Return the key rendered by the WES which a field is decoded from, the key itself if rendered."""
+    return SNAPSHOT_LAYOUT.sources.get(key, key)
+
+
+class WesSnapshot:
+    """Typed values of one poll, stored in flat buffers indexed by the layout."""
+
+    __slots__ = ("layout", "floats", "ints", "texts", "extra")
+
+    def __init__(self, layout, floats, ints, texts) -> None:
+        self.layout = layout
+        self.floats = floats
+        self.ints = ints
+        self.texts = texts
+        # Leaves which are not part of the layout, kept as raw text
+        self.extra = {}
+
+    def value(self, field):
+        """Return the value of a field, None when it's absent from the payload."""
+        if field.kind == FIELD_FLOAT:
+            value = self.floats[field.index]
+            return None if value != value else value
+        elif field.kind == FIELD_INT:
+            value = self.ints[field.index]
+            return None if value == INT_MISSING else value
+        return self.texts[field.index]
+
+    def set_value(self, field, text):
+        """Convert the raw text of a field into its buffer, left missing if it can't be parsed."""
+        try:
+            if field.kind == FIELD_FLOAT:
+                self.floats[field.index] = float(text)
+            elif field.kind == FIELD_INT:
+                self.ints[field.index] = int(text)
+            else:
+                text = text.strip()
+                self.texts[field.index] = text
+                if field in self.layout.decoders:
+                    self._decode(field, text)
+        except ValueError:
+            # "Pas Dispo" or an empty value on a disconnected channel
+            pass
+
+    def _decode(self, field, text):
+        decoder, decoded_fields = self.layout.decoders[field]
+        for decoded_field, value in zip(decoded_fields, decoder(text)):
+            if value is not None:
+                self.floats[decoded_field.index] = value
+
+    def merge(self, other):
+        """Copy the values present in other, e.g. from a sensor file polled at another rate."""
+        floats = self.floats
+        for i, value in enumerate(other.floats):
+            if value == value:
+                floats[i] = value
+        for values, other_values, missing in ((self.ints, other.ints, INT_MISSING), (self.texts, other.texts, None)):
+            for i, value in enumerate(other_values):
+                if value != missing:
+                    values[i] = value
+        self.extra.update(other.extra)
+
+    def copy(self):
+        snapshot = WesSnapshot(self.layout, array("d", self.floats), array("q", self.ints), list(self.texts))
+        snapshot.extra = dict(self.extra)
+        return snapshot
+
+    def changed_fields(self, previous):
+        """Return the set of fields whose value differs from the previous snapshot."""
+        if previous is None or previous.layout is not self.layout:
+            return set(self.layout.fields.values())
+        changed = set()
+        fields_by_kind = self.layout.fields_by_kind
+        # Compare the float buffers as bytes so missing (NaN) values are equal
+        if self.floats.tobytes() != previous.floats.tobytes():
+            fields = fields_by_kind[FIELD_FLOAT]
+            for i, (value, old_value) in enumerate(zip(self.floats, previous.floats)):
+                if value != old_value and (value == value or old_value == old_value):
+                    changed.add(fields[i])
+        for kind, values, old_values in ((FIELD_INT, self.ints, previous.ints), (FIELD_TEXT, self.texts, previous.texts)):
+            if values != old_values:
+                fields = fields_by_kind[kind]
+                for i, (value, old_value) in enumerate(zip(values, old_values)):
+                    if value != old_value:
+                        changed.add(fields[i])
+        return changed
+
+    def get(self, key, default=None):
+        field = self.layout.fields.get(key)
+        if field is None:
+            return self.extra.get(key, default)
+        value = self.value(field)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        field = self.layout.fields.get(key)
+        if field is None:
+            return self.extra[key]
+        return self.value(field)
+
+    def as_dict(self):
+        data = {key: self.value(field) for key, field in self.layout.fields.items()}
+        data.update(self.extra)
+        return data
+
+    def __repr__(self) -> str:
+        return f"WesSnapshot({self.as_dict()})"
+
+    def __reduce__(self):
+        # Sent back from the parsing process: only the buffers, the layout is the module one
+        return (restore_snapshot, (self.floats, self.ints, self.texts, self.extra))
+
+
+def restore_snapshot(floats, ints, texts, extra):
+    """Rebuild a snapshot of the module layout from its buffers."""
+    snapshot = WesSnapshot(SNAPSHOT_LAYOUT, array("d", floats), array("q", ints), list(texts))
+    snapshot.extra = dict(extra)
+    return snapshot
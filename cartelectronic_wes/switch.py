@@ -5,12 +5,12 @@ import logging
 
 from homeassistant import config_entries, core
 from homeassistant.core import callback
-
 from homeassistant.components.switch import SwitchEntity, SwitchEntityDescription, SwitchDeviceClass
 from homeassistant.helpers.entity import DeviceInfo
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN, SENSOR_ID_PREFIX
+from .const import DOMAIN, SENSOR_ID_PREFIX, RELAY_COUNT, VIRTUAL_SWITCH_COUNT
+from .entity import WesCoordinatorEntity
+from .snapshot import get_field
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,10 +22,39 @@ async def async_setup_entry(
 ):
     """Setup switch from a config entry created in the integrations UI."""
     coordinator = hass.data[DOMAIN][config_entry.entry_id]
-    async_add_entities([RelaySwitch(coordinator, i) for i in range(1, 3)])
-    async_add_entities([VirtualSwitch(coordinator, i) for i in range(1, 25)])
+    async_add_entities([RelaySwitch(coordinator, i) for i in range(1, RELAY_COUNT + 1)])
+    # Virtual switches off on setup are created disabled, they can be enabled to be turned on from HA
+    async_add_entities([
+        VirtualSwitch(coordinator, i, enabled_default=virtual_switch_in_use(coordinator.data.value(get_field(f"virtual_switch.switch{i}"))))
+        for i in range(1, VIRTUAL_SWITCH_COUNT + 1)
+    ])
+
+
+def virtual_switch_in_use(value):
+    return value == 1
+
+class BaseWesSwitch(SwitchEntity, WesCoordinatorEntity):
+
+    async def _async_send(self, is_on, command):
+        """Apply is_on optimistically and send the command.
+
+        The state is reverted if the command is refused, otherwise it's confirmed by the next poll.
+        """
+        previous = self._is_on
+        self._is_on = is_on
+        self.async_write_ha_state()
+        result = False
+        try:
+            result = await command
+        finally:
+            if not result:
+                self._is_on = previous
+                self.async_write_ha_state()
+            self.coordinator.async_expect_change(self._field)
+        return result
 
-class RelaySwitch(SwitchEntity, CoordinatorEntity):
+
+class RelaySwitch(BaseWesSwitch):
     _attr_device_class = SwitchDeviceClass.SWITCH
 
     def __init__(self,coordinator, id):
@@ -36,6 +65,7 @@ class RelaySwitch(SwitchEntity, CoordinatorEntity):
         self.__id = id
         self._attr_name = f"relay{self.__id}"
         self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_relay{self.__id}"
+        self.bind_field(f"relays.relay{self.__id}.enabled")
         self._is_on = False
 
     @property
@@ -63,28 +93,24 @@ class RelaySwitch(SwitchEntity, CoordinatorEntity):
     async def async_turn_off(self, **kwargs):
         """Turn the entity off."""
         _LOGGER.debug(f"Turn off wes relay {self.__id}")
-        if await self.api.switch_relay(self.__id, on=False):
-            self._is_on = False
-            self.async_write_ha_state()
+        await self._async_send(False, self.api.switch_relay(self.__id, on=False))
 
     async def async_turn_on(self, **kwargs):
         """Turn the entity on."""
         _LOGGER.debug(f"Turn on wes relay {self.__id}")
-        if await self.api.switch_relay(self.__id, on=True):
-            self._is_on = True
-            self.async_write_ha_state()
+        await self._async_send(True, self.api.switch_relay(self.__id, on=True))
 
     async def async_toggle(self, **kwargs):
         _LOGGER.debug(f"Toggle wes relay {self.__id}")
-        return await self.api.toggle_relay(self.__id)
+        return await self._async_send(not self._is_on, self.api.toggle_relay(self.__id))
     
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
         try:
-            relay_status = self.coordinator.data["relays"][f"relay{self.__id}"]["enabled"]
+            relay_status = self.coordinator.data.value(self._field)
             _LOGGER.debug(f"Found status {relay_status} for relay {self.__id}")
-            if relay_status == "1":
+            if relay_status == 1:
                 self._is_on = True
             else:
                 self._is_on = False
@@ -96,17 +122,20 @@ class RelaySwitch(SwitchEntity, CoordinatorEntity):
             raise
 
 
-class VirtualSwitch(SwitchEntity, CoordinatorEntity):
+class VirtualSwitch(BaseWesSwitch):
     _attr_device_class = SwitchDeviceClass.SWITCH
 
-    def __init__(self,coordinator, id):
+    def __init__(self,coordinator, id, enabled_default=True):
         super().__init__(coordinator)
         self.coordinator = coordinator
         self.api = coordinator.api
         self.serial_number = self.api.serial
         self.__id = id
+        # Disabled entities aren't rendered in the sensor file generated for the device
+        self._attr_entity_registry_enabled_default = enabled_default
         self._attr_name = f"virtual switch{self.__id}"
         self._attr_unique_id = f"{SENSOR_ID_PREFIX}{self.serial_number}_virtual_switch{self.__id}"
+        self.bind_field(f"virtual_switch.switch{self.__id}")
         self._is_on = False
 
     @property
@@ -134,28 +163,24 @@ class VirtualSwitch(SwitchEntity, CoordinatorEntity):
     async def async_turn_off(self, **kwargs):
         """Turn the entity off."""
         _LOGGER.debug(f"Turn off wes virtual_switch {self.__id}")
-        if await self.api.switch_vs(self.__id, on=False):
-            self._is_on = False
-            self.async_write_ha_state()
+        await self._async_send(False, self.api.switch_vs(self.__id, on=False))
 
     async def async_turn_on(self, **kwargs):
         """Turn the entity on."""
         _LOGGER.debug(f"Turn on wes virtual_switch {self.__id}")
-        if await self.api.switch_vs(self.__id, on=True):
-            self._is_on = True
-            self.async_write_ha_state()
+        await self._async_send(True, self.api.switch_vs(self.__id, on=True))
 
     async def async_toggle(self, **kwargs):
         _LOGGER.debug(f"Toggle wes virtual_switch {self.__id}")
-        return await self.api.toggle_vs(self.__id)
+        return await self._async_send(not self._is_on, self.api.toggle_vs(self.__id))
     
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
         try:
-            switch_status = self.coordinator.data["virtual_switch"][f"switch{self.__id}"]
+            switch_status = self.coordinator.data.value(self._field)
             _LOGGER.debug(f"Found status {switch_status} for virtual_switch {self.__id}")
-            if switch_status == "1":
+            if switch_status == 1:
                 self._is_on = True
             else:
                 self._is_on = False
@@ -0,0 +1,128 @@
+"""Labels reported by a TIC meter, from its tariff option (OPTARIF) and its phase count."""
+from typing import NamedTuple
+
+from .const import TIC_CONSUMPTION_INDEX_LABELS, TIC_PRODUCTION_INDEX_LABELS
+
+# Rendered by the WES for the labels of a meter not connected
+TIC_NOT_AVAILABLE = "Pas Dispo"
+
+TARIFF_BASE = "BASE"
+TARIFF_HC = "HC"
+TARIFF_EJP = "EJP"
+TARIFF_TEMPO = "BBR"
+# Consumption indexes of each tariff option, OPTARIF is matched on its prefix ("HC..", "BBR(")
+TARIFF_INDEX_LABELS = {
+    TARIFF_BASE: ["BASE"],
+    TARIFF_HC: ["H_PLEINE", "H_CREUSE"],
+    TARIFF_EJP: ["EJPHN", "EJPHPM"],
+    TARIFF_TEMPO: ["BBRHCJB", "BBRHPJB", "BBRHCJW", "BBRHPJW", "BBRHCJR", "BBRHPJR"],
+}
+
+MONO_PHASE_INTENSITY_LABELS = ["IINST", "IMAX"]
+THREE_PHASE_INTENSITY_LABELS = ["IINST1", "IINST2", "IINST3", "IMAX1", "IMAX2", "IMAX3"]
+MONO_PHASE_VOLTAGE_LABELS = ["TENSION1"]
+THREE_PHASE_VOLTAGE_LABELS = ["TENSION1", "TENSION2", "TENSION3"]
+# Contract and period labels, with the notices of the options announcing their peak days
+SUBSCRIPTION_LABELS = ["OPTARIF", "ISOUSC", "PTEC"]
+TARIFF_NOTICE_LABELS = {
+    TARIFF_EJP: ["PEJP"],
+    TARIFF_TEMPO: ["DEMAIN"],
+}
+
+# Tariff period of the first two letters of PTEC ("HC..", "HPJR")
+PERIOD_ALL_HOURS = "all_hours"
+PERIOD_OFF_PEAK = "off_peak"
+PERIOD_PEAK = "peak"
+PERIOD_NORMAL = "normal"
+PERIOD_MOBILE_PEAK = "mobile_peak"
+TARIFF_PERIODS = {
+    "TH": PERIOD_ALL_HOURS,
+    "HC": PERIOD_OFF_PEAK,
+    "HP": PERIOD_PEAK,
+    "HN": PERIOD_NORMAL,
+    "PM": PERIOD_MOBILE_PEAK,
+}
+# Tempo day colours, of the last letter of PTEC and of DEMAIN
+TEMPO_BLUE = "blue"
+TEMPO_WHITE = "white"
+TEMPO_RED = "red"
+TEMPO_COLOURS = [TEMPO_BLUE, TEMPO_WHITE, TEMPO_RED]
+PTEC_COLOURS = {"B": TEMPO_BLUE, "W": TEMPO_WHITE, "R": TEMPO_RED}
+DEMAIN_COLOURS = {"BLEU": TEMPO_BLUE, "BLAN": TEMPO_WHITE, "ROUG": TEMPO_RED}
+
+
+class TicMeterModel(NamedTuple):
+    """Tariff option, phase count and labels of the entities of a meter."""
+    tariff: str
+    phases: int
+    index_labels: tuple
+    apparent_power_labels: tuple
+    intensity_labels: tuple
+    voltage_labels: tuple
+    subscription_labels: tuple
+
+
+def tariff_option(optarif):
+    """Return the tariff option of an OPTARIF value, None if not recognized."""
+    if not optarif:
+        return None
+    for tariff in TARIFF_INDEX_LABELS:
+        if optarif.startswith(tariff):
+            return tariff
+    return None
+
+
+def _reported(data, prefix, label):
+    value = data.get(f"{prefix}.{label}")
+    return value is not None and value > 0
+
+
+def tic_meter_model(data, id):
+    """Return the model of the meter id from the snapshot data, None if it isn't connected.
+
+    Indexes are the ones of the tariff option, or the ones not at zero when the option isn't
+    recognized. Voltages and production are only in the model when the meter reports them.
+    """
+    prefix = f"tics.tic{id}"
+    if (data.get(f"{prefix}.ADCO") or TIC_NOT_AVAILABLE).startswith(TIC_NOT_AVAILABLE):
+        return None
+    optarif = data.get(f"{prefix}.OPTARIF")
+    tariff = tariff_option(optarif)
+    if tariff is not None:
+        index_labels = list(TARIFF_INDEX_LABELS[tariff])
+    else:
+        index_labels = [label for label in TIC_CONSUMPTION_INDEX_LABELS if _reported(data, prefix, label)]
+    production_labels = [label for label in TIC_PRODUCTION_INDEX_LABELS if _reported(data, prefix, label)]
+    apparent_power_labels = ["PAP"]
+    if production_labels or _reported(data, prefix, "PAPIJ"):
+        apparent_power_labels.append("PAPIJ")
+    # The intensities of each phase are only rendered by three-phase meters
+    if any(_reported(data, prefix, label) for label in THREE_PHASE_INTENSITY_LABELS):
+        phases, intensity_labels, voltage_labels = 3, THREE_PHASE_INTENSITY_LABELS, THREE_PHASE_VOLTAGE_LABELS
+    else:
+        phases, intensity_labels, voltage_labels = 1, MONO_PHASE_INTENSITY_LABELS, MONO_PHASE_VOLTAGE_LABELS
+    return TicMeterModel(
+        tariff or optarif,
+        phases,
+        tuple(index_labels + production_labels),
+        tuple(apparent_power_labels),
+        tuple(intensity_labels),
+        tuple(label for label in voltage_labels if _reported(data, prefix, label)),
+        tuple(SUBSCRIPTION_LABELS + TARIFF_NOTICE_LABELS.get(tariff, [])),
+    )
+
+
+def tariff_period(ptec):
+    """Return the (period, Tempo colour) of a PTEC value, the colour is None out of Tempo.
+
+    The period is None if PTEC isn't recognized.
+    """
+    if not ptec:
+        return None, None
+    colour = PTEC_COLOURS.get(ptec[3:4]) if ptec[2:3] == "J" else None
+    return TARIFF_PERIODS.get(ptec[:2]), colour
+
+
+def tempo_colour(demain):
+    """Return the Tempo colour of tomorrow from DEMAIN, None while not announced ("----")."""
+    return DEMAIN_COLOURS.get(demain)
@@ -1,18 +1,62 @@
 import logging
 import asyncio
+import io
+import time
 
-from ftplib import FTP
-from urllib.parse import urljoin
+from ftplib import FTP, Error as FtpError, error_perm
+from urllib.parse import urljoin, urlsplit
 
-import xmltodict
 import aiohttp
 
+from .metrics import WesMetrics, STAGE_CONNECT, STAGE_RESPONSE, STAGE_BODY, STAGE_PARSE, STAGE_LOOP_BLOCKING
+from .parser import PAYLOAD_ENCODING, parse_payload_timed, payload_digest
+
 logger = logging.getLogger(__name__)
 
 USER_ADMIN_CHECK_URL = "/INFOCFG.HTM"
 USER_READONLY_CHECK_URL = "/index.htm"
 AJAX_URL = "/AJAX.CGX"
 DATA_URL = "/DATA.cgx"
+# The WES is slow to accept new connections and to serve parallel requests
+CONNECTION_LIMIT_PER_HOST = 2
+KEEPALIVE_TIMEOUT = 60
+# Age under which status reads are served from the last sensor data
+SENSOR_DATA_TTL = 2
+# Commands queued within this delay are sent in a single AJAX request
+COMMAND_BATCH_WINDOW = 0.05
+# Parameters whose value is a channel id, two of them can't share a request
+TOGGLE_PARAMS = ("frl", "fvs")
+# Params setting a relay or virtual switch, followed by its number
+SET_PARAMS = ("rl", "vs")
+FTP_PORT = 21
+# Seconds to connect and between two blocks of a transfer, the WES FTP server is slow but small
+FTP_TIMEOUT = 15
+
+def command_targets(params):
+    """Return {(channel, number): "set" or "toggle"} of the relays and virtual switches addressed by params."""
+    targets = {}
+    for key, value in params.items():
+        if key in TOGGLE_PARAMS:
+            targets[(key[1:], str(value))] = "toggle"
+        elif key[:2] in SET_PARAMS and key[2:].isdigit():
+            targets[(key[:2], key[2:])] = "set"
+    return targets
+
+
+def commands_conflict(batch, params):
+    """Return True if params can't be merged into the batch of commands.
+
+    A toggle param holds a single channel, and a channel both set and toggled gives a result
+    depending on the order the device processes them.
+    """
+    if any(key in batch for key in TOGGLE_PARAMS if key in params):
+        return True
+    batch_targets = command_targets(batch)
+    return any(
+        target in batch_targets and batch_targets[target] != command
+        for target, command in command_targets(params).items()
+    )
+
 
 class WesDevice:
 
@@ -28,7 +72,7 @@ class WesDevice:
 
 class WesApi:
 
-    def __init__(self, host, user, password, session=None, sensor_filename="/DATA.cgx") -> None:
+    def __init__(self, host, user, password, session=None, sensor_filename="/DATA.cgx", cache_ttl=SENSOR_DATA_TTL) -> None:
         self.host = host
         if host.startswith("http://"):
             self.url = host
@@ -41,27 +85,68 @@ class WesApi:
         self._admin = None
         self.device = None
         self.SENSOR_FILENAME = sensor_filename
-
-    def __del__(self):
-        if self._self_session:
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    loop.create_task(self._self_session.close())
-                else:
-                    loop.run_until_complete(self._self_session.close())
-            except:
-                pass
+        # (filename, interval) polled together, the first one on each poll, the others once due
+        self.sensor_files = [(sensor_filename, 0)]
+        self._sensor_files_due = {}
+        # Last data of each file after the first one, merged into the data of the first one
+        self._sensor_files_data = {}
+        self.cache_ttl = cache_ttl
+        self._sensor_fetch = None
+        self._sensor_data = None
+        self._sensor_data_time = 0
+        # Incremented when the device state changed (command, push), fetches started before are stale
+        self.sensor_data_generation = 0
+        self._command_listeners = []
+        self._command_batch = None
+        # Executor parsing the payloads out of the event loop, None to parse while receiving
+        self.parse_executor = None
+        # Payloads smaller than this (bytes) are parsed on the event loop even with an executor
+        self.parse_threshold = 0
+        self.last_parse_blocking_time = 0
+        # Calibration of the channels applied to every parsed payload, None to keep the raw values
+        self.calibration = None
+        # (digest, data) of the last payload of each file, unchanged payloads aren't parsed again
+        self._payloads = {}
+        # (data of the first file, data merged with the slow files) of the last poll
+        self._merged_data = None
+        self.metrics = WesMetrics()
 
     def _setup_session(self, session=None):
-        self._global_session = None
+        # A given session (e.g. Home Assistant one) is shared and never closed here
+        self._global_session = session
+        self._self_session = None
+
+    @property
+    def client(self):
+        if self._global_session:
+            return self._global_session
+        if self._self_session is None or self._self_session.closed:
+            # Own pool, created lazily inside the running loop, keeping connections to the WES alive
+            connector = aiohttp.TCPConnector(
+                limit_per_host=CONNECTION_LIMIT_PER_HOST,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            )
+            self._self_session = aiohttp.ClientSession(connector=connector, trace_configs=[self._trace_config()])
+        return self._self_session
+
+    def _trace_config(self):
+        """Time the opening of new connections of the owned pool."""
+        async def connection_create_start(session, context, params):
+            context.connect_start = time.perf_counter()
+
+        async def connection_create_end(session, context, params):
+            self.metrics.record(STAGE_CONNECT, time.perf_counter() - context.connect_start)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_start.append(connection_create_start)
+        trace_config.on_connection_create_end.append(connection_create_end)
+        return trace_config
+
+    async def close(self):
+        """Close the owned session, must be awaited when the api is not used anymore."""
+        if self._self_session and not self._self_session.closed:
+            await self._self_session.close()
         self._self_session = None
-        if session:
-            self._global_session = session
-            self.client = self._global_session
-        else:
-            self._self_session = aiohttp.ClientSession()
-            self.client = self._self_session
     
     def get_absolute_url(self, url):
         if url.startswith("http://"):
@@ -78,51 +163,212 @@ class WesApi:
         async with self.client.get(self.get_absolute_url(url), auth=self.__auth, params=params) as response:
             return response
 
+    async def has_file(self, url):
+        async with self.client.get(self.get_absolute_url(url), auth=self.__auth) as response:
+            return response.status == 200
+
     async def fetch_xml_data(self, url):
+        start = time.perf_counter()
         async with self.client.get(self.get_absolute_url(url), auth=self.__auth) as response:
+            headers_time = time.perf_counter()
+            self.metrics.record(STAGE_RESPONSE, headers_time - start)
             if response.status == 200:
-                response_text = await response.text()
-                data = xmltodict.parse(response_text)
+                encoding = response.charset or PAYLOAD_ENCODING
+                payload = await response.read()
+                self.metrics.record(STAGE_BODY, time.perf_counter() - headers_time)
                 try:
-                    logger.debug(f"Retrieved data {data}")
-                    return data.get("data", data)
-                except KeyError:
-                    logger.warning("Unable to retrieve data from response")
+                    data = await self._parse_payload(url, payload, encoding)
+                except ValueError as e:
+                    logger.warning(f"Unable to parse data from response: {e}")
+                    return None
+                logger.debug("Retrieved data %s", data)
+                return data
             else:
                 logger.warning(f"Unable to retrieve {response}")
     
+    async def _parse_payload(self, url, payload, encoding):
+        """Parse on the event loop, or on the executor when the payload is large.
+
+        A payload with the same values as the last one of url isn't parsed, its data is returned
+        again so the coordinator skips the update. The parse time is recorded in both modes, the
+        time the parsing blocked the event loop separately, and kept in last_parse_blocking_time.
+        """
+        size = len(payload)
+        self.metrics.record_payload(size)
+        digest = payload_digest(payload)
+        last = self._payloads.get(url)
+        if last is not None and last[0] == digest:
+            self.metrics.unchanged_payloads += 1
+            logger.debug("Payload of %s unchanged, parse skipped", url)
+            return last[1]
+        blocking_time = 0
+        if self.parse_executor is None or size < self.parse_threshold:
+            data, parse_time = parse_payload_timed(payload, encoding)
+            blocking_time = parse_time
+            mode = "inline"
+        else:
+            loop = asyncio.get_running_loop()
+            # Timed in the worker, not including the wait for the executor
+            data, parse_time = await loop.run_in_executor(self.parse_executor, parse_payload_timed, payload, encoding)
+            mode = "executor"
+        if self.calibration:
+            self.calibration.apply(data)
+        self._payloads[url] = (digest, data)
+        self.last_parse_blocking_time = blocking_time
+        self.metrics.record(STAGE_PARSE, parse_time)
+        self.metrics.record(STAGE_LOOP_BLOCKING, blocking_time)
+        logger.debug("Parsed %s bytes (%s) in %.3f ms, event loop blocked %.3f ms", size, mode, parse_time * 1000, blocking_time * 1000)
+        return data
+
     async def ajax_command(self, params):
         response = await self.fetch_url(self.ajax_url, params=params)
         if response.status == 200:
+            # The command changed the device state, don't serve status reads from the cache
+            self.invalidate_sensor_data()
+            for listener in self._command_listeners:
+                listener()
             return True
         else:
             logger.warning(f"Unable to process request, status {response.status}")
             return False
 
+    async def queue_command(self, params):
+        """Send params with the other commands queued within the batch window in one AJAX request.
+
+        Return the result of the merged request.
+        """
+        batch = self._command_batch
+        if batch is not None and not commands_conflict(batch[0], params):
+            # Last value wins for a relay or virtual switch set twice in the window
+            batch[0].update(params)
+        else:
+            batch = [dict(params), None]
+            batch[1] = asyncio.ensure_future(self._send_command_batch(batch))
+            self._command_batch = batch
+        return await asyncio.shield(batch[1])
+
+    async def _send_command_batch(self, batch):
+        await asyncio.sleep(COMMAND_BATCH_WINDOW)
+        if self._command_batch is batch:
+            self._command_batch = None
+        return await self.ajax_command(batch[0])
+
     async def fetch_data(self):
         return await self.fetch_xml_data(DATA_URL)
 
-    async def fetch_sensor_data(self):
-        return await self.fetch_xml_data(f"/{self.SENSOR_FILENAME}")
+    async def fetch_sensor_data(self, max_age=0):
+        """Fetch the sensor file, concurrent callers share the same request.
+
+        Data fetched less than max_age seconds ago is returned without querying the device.
+        """
+        if max_age and self._sensor_data is not None and time.monotonic() - self._sensor_data_time <= max_age:
+            return self._sensor_data
+        if self._sensor_fetch is None:
+            self._sensor_fetch = asyncio.ensure_future(self._fetch_sensor_data())
+            self._sensor_fetch.add_done_callback(self._sensor_fetch_done)
+        # A cancelled caller (e.g. on timeout) must not cancel the request of the others
+        return await asyncio.shield(self._sensor_fetch)
+
+    async def _fetch_sensor_data(self):
+        generation = self.sensor_data_generation
+        now = time.monotonic()
+        files = [self.sensor_files[0]] + [
+            (filename, interval) for filename, interval in self.sensor_files[1:]
+            if now >= self._sensor_files_due.get(filename, 0)
+        ]
+        results = await asyncio.gather(
+            *(self.fetch_xml_data(f"/{filename}") for filename, _ in files), return_exceptions=True
+        )
+        # Only the main file fails the poll
+        data = results[0]
+        if isinstance(data, BaseException):
+            raise data
+        if data is None:
+            return None
+        slow_files_changed = False
+        for (filename, interval), file_data in zip(files[1:], results[1:]):
+            if isinstance(file_data, BaseException):
+                logger.debug(f"Unable to fetch {filename}, keep its last data: {file_data!r}")
+                file_data = None
+            # A slow file which failed is fetched again on next poll
+            if file_data is not None:
+                slow_files_changed |= file_data is not self._sensor_files_data.get(filename)
+                self._sensor_files_data[filename] = file_data
+                self._sensor_files_due[filename] = now + interval
+        if len(self.sensor_files) > 1:
+            if self._merged_data is not None and self._merged_data[0] is data and not slow_files_changed:
+                # Nothing changed, the same data again
+                data = self._merged_data[1]
+            else:
+                # The parsed data is kept as is to be compared with the next payloads
+                merged = data.copy()
+                for filename, _ in self.sensor_files[1:]:
+                    if filename in self._sensor_files_data:
+                        merged.merge(self._sensor_files_data[filename])
+                self._merged_data = (data, merged)
+                data = merged
+        # Read before a command, returned to the callers waiting for it but not cached
+        if generation == self.sensor_data_generation:
+            self._sensor_data = data
+            self._sensor_data_time = time.monotonic()
+        return data
+
+    def _sensor_fetch_done(self, future):
+        # A newer fetch may have replaced a stale one
+        if self._sensor_fetch is future:
+            self._sensor_fetch = None
+        if not future.cancelled():
+            # Retrieve the exception so it's not reported as never retrieved when nobody awaits it anymore
+            future.exception()
+
+    def add_command_listener(self, listener):
+        """Call listener after each command accepted by the device."""
+        self._command_listeners.append(listener)
+
+    def invalidate_sensor_data(self):
+        """Drop the cached data, a fetch in flight isn't shared with the next callers anymore."""
+        self.sensor_data_generation += 1
+        self._sensor_data = None
+        self._sensor_fetch = None
+
+    def invalidate_fields(self, fields):
+        """Fetch again on next poll the slow files rendering fields, their data predates a value pushed by the device.
+
+        Until then the merged data would bring the old values back.
+        """
+        for filename, file_data in self._sensor_files_data.items():
+            if any(file_data.value(field) is not None for field in fields):
+                self._sensor_files_due[filename] = 0
+                self._merged_data = None
+
+    def use_sensor_files(self, files):
+        """Poll the (filename, interval) files from now on, the data of the previous files is dropped."""
+        self.sensor_files = list(files)
+        self.SENSOR_FILENAME = self.sensor_files[0][0]
+        self._sensor_files_due = {}
+        self._sensor_files_data = {}
+        self._merged_data = None
+        self._payloads = {}
+        self.invalidate_sensor_data()
     
     async def set_device_property(self):
-        data = await self.fetch_sensor_data()
+        data = await self.fetch_sensor_data(max_age=self.cache_ttl)
         try:
             device = WesDevice
-            serial = data["info"]["serial"]
-            hw_version = data["info"]["hardware"]
-            sw_version = data["info"]["firmware"]
+            serial = data["info.serial"]
+            hw_version = data["info.hardware"]
+            sw_version = data["info.firmware"]
             device = WesDevice(serial=serial, hw_version=hw_version, sw_version=sw_version)
             self.device = device
         except KeyError:
             logger.warning("Unable to set the device property, key not present on file")
 
     async def relay_is_on(self, id):
-        data = await self.fetch_sensor_data()
+        data = await self.fetch_sensor_data(max_age=self.cache_ttl)
         try:
-            relay_status = data["data"]["relays"][f"relay{id}"]["enabled"]
+            relay_status = data[f"relays.relay{id}.enabled"]
             logger.debug(f"Found status {relay_status} for relay {id}")
-            if relay_status == "1":
+            if relay_status == 1:
                 return True
             else:
                 return False
@@ -135,19 +381,19 @@ class WesApi:
         value = "ON" if on else "OFF"
         logger.debug(f"Switch relay {id} {value}")
         params = {f'rl{id}': value}
-        return await self.ajax_command(params)
+        return await self.queue_command(params)
             
     async def toggle_relay(self, id):
         logger.debug(f"Toggle relay {id}")
         params = {f'frl': id}
-        return await self.ajax_command(params)
+        return await self.queue_command(params)
     
     async def vs_is_on(self, id):
-        data = await self.fetch_sensor_data()
+        data = await self.fetch_sensor_data(max_age=self.cache_ttl)
         try:
-            relay_status = data["data"]["virtual_switch"][f"switch{id}"]
+            relay_status = data[f"virtual_switch.switch{id}"]
             logger.debug(f"Found status {relay_status} for relay {id}")
-            if relay_status == "1":
+            if relay_status == 1:
                 return True
             else:
                 return False
@@ -160,12 +406,12 @@ class WesApi:
         value = "ON" if on else "OFF"
         logger.debug(f"Switch relay {id} {value}")
         params = {f'vs{id}': value}
-        return await self.ajax_command(params)
+        return await self.queue_command(params)
             
     async def toggle_vs(self, id):
         logger.debug(f"Toggle relay {id}")
         params = {f'fvs': id}
-        return await self.ajax_command(params)
+        return await self.queue_command(params)
             
     async def reset_server(self):
         try:
@@ -204,22 +450,102 @@ class WesApi:
             return False
         
 
+class WesFtpError(Exception):
+    """A file uploaded to the WES reads back different."""
+
+
 class WesFtp:
+    """FTP client of the WES, connected on first use and reused for all the files until closed.
 
-    def __init__(self, host, user, password) -> None:
-        self.host = host
+    ftplib is blocking, the methods must run in an executor.
+    """
+
+    def __init__(self, host, user, password, port=FTP_PORT, timeout=FTP_TIMEOUT) -> None:
+        # Host of the web interface, possibly with its scheme and HTTP port
+        self.host = urlsplit(host if "//" in host else f"//{host}").hostname
+        self.port = port
         self.user = user
         self.__password = password
-        self.client = FTP(self.host)
+        self.timeout = timeout
+        self.client = None
         self.logged = False
 
-    def upload_file(self, filepath, filename=None):
+    def login(self):
+        if self.client is None:
+            client = FTP(timeout=self.timeout)
+            client.connect(self.host, self.port)
+            self.client = client
         if not self.logged:
             self.client.login(self.user, self.__password)
-        if not filename:
-            filename = filepath.name
-        with open(filepath, "rb") as fp:
-            self.client.storbinary(f"STOR {filename}", fp)
+            self.logged = True
+        return self.client
+
+    def read_file(self, filename):
+        """Return the content of filename, None if it does not exist."""
+        buffer = io.BytesIO()
+        try:
+            self.login().retrbinary(f"RETR {filename}", buffer.write)
+        except error_perm:
+            return None
+        return buffer.getvalue()
+
+    def file_size(self, filename):
+        """Return the size of filename, None if missing or not reported by the server."""
+        client = self.login()
+        try:
+            client.voidcmd("TYPE I")
+            return client.size(filename)
+        except error_perm:
+            return None
 
-    def __del__(self):
-        self.client.close()
\ No newline at end of file
+    def has_data(self, data, filename):
+        """Return True if filename holds data, the content is only read back when the size matches."""
+        size = self.file_size(filename)
+        if size is not None and size != len(data):
+            return False
+        return self.read_file(filename) == data
+
+    def upload_data(self, data, filename):
+        """Upload data as filename unless it already holds it, return True if uploaded.
+
+        The file is read back to check the upload.
+        """
+        if self.has_data(data, filename):
+            logger.debug(f"{filename} is up to date on {self.host}")
+            return False
+        self.login().storbinary(f"STOR {filename}", io.BytesIO(data))
+        if self.read_file(filename) != data:
+            raise WesFtpError(f"{filename} reads back different from the uploaded data on {self.host}")
+        logger.debug(f"Uploaded {len(data)} bytes to {filename} on {self.host}")
+        return True
+
+    def upload_file(self, filepath, filename=None):
+        return self.upload_data(filepath.read_bytes(), filename or filepath.name)
+
+    def delete_file(self, filename):
+        self.login().delete(filename)
+
+    def upload_files(self, files, obsolete=()):
+        """Upload the (filename, data) of files, delete the obsolete filenames, then close.
+
+        Return the filenames uploaded, those already up to date are skipped.
+        """
+        try:
+            uploaded = [filename for filename, data in files if self.upload_data(data, filename)]
+            for filename in obsolete:
+                try:
+                    self.delete_file(filename)
+                except error_perm as e:
+                    logger.debug(f"Unable to delete {filename}: {e}")
+            return uploaded
+        finally:
+            self.close()
+
+    def close(self):
+        if self.client is not None:
+            try:
+                self.client.quit()
+            except (OSError, EOFError, FtpError):
+                self.client.close()
+        self.client = None
+        self.logged = False
@@ -0,0 +1,103 @@
+"""Hourly energy statistics of the indexes, driven by every poll."""
+import asyncio
+import types
+
+from homeassistant.core import HomeAssistant
+
+from cartelectronic_wes import energy
+from cartelectronic_wes.energy import HOUR, WesEnergyStatistics
+from cartelectronic_wes.parser import parse_payload
+from cartelectronic_wes.snapshot import get_field
+
+from bench_parser import PAYLOADS_DIR
+
+KEY = "clamps.clamp1.index"
+# 22:00 UTC
+START = 1_700_000_000 - 1_700_000_000 % (24 * HOUR) + 22 * HOUR
+
+
+class FakeCoordinator:
+    def __init__(self, data) -> None:
+        self.data = data
+        self.restored = False
+        self.last_update_success = True
+        self.api = types.SimpleNamespace(serial="X")
+        self._poll_listeners = []
+
+    def bound_keys(self):
+        return {KEY}
+
+    def async_add_poll_listener(self, update_callback):
+        self._poll_listeners.append(update_callback)
+        return lambda: self._poll_listeners.remove(update_callback)
+
+    def poll(self, index):
+        data = self.data.copy()
+        data.set_value(get_field(KEY), str(index))
+        # An unchanged payload keeps the same snapshot, the poll listeners are still called
+        if data.value(get_field(KEY)) != self.data.value(get_field(KEY)):
+            self.data = data
+        for update_callback in list(self._poll_listeners):
+            update_callback()
+
+
+def test_idle_hours_then_change(tmp_path, monkeypatch):
+    """An index idle for 8 hours books 0 Wh in each of them, the change lands in its own hour."""
+
+    async def run():
+        hass = HomeAssistant(str(tmp_path))
+        hass.config.components.add("recorder")
+        coordinator = FakeCoordinator(parse_payload(PAYLOADS_DIR.joinpath("mono_hc.xml").read_bytes()))
+        statistics = WesEnergyStatistics(hass, coordinator, "entry")
+        hours = []
+        monkeypatch.setattr(statistics, "_async_add_statistics", lambda key, completed: hours.extend(completed))
+        now = START
+        monkeypatch.setattr(energy.time, "time", lambda: now)
+        coordinator.poll(1000)
+        stop = await statistics.async_start()
+        # Polled every 10 minutes, the index doesn't move until 06:00
+        while now < START + 8 * HOUR:
+            now += 600
+            coordinator.poll(1000)
+        now += 10
+        coordinator.poll(1010)
+        now = START + 9 * HOUR
+        coordinator.poll(1010)
+        stop()
+        await hass.async_stop(force=True)
+        return hours
+
+    hours = asyncio.run(run())
+    assert [start for start, _, _ in hours] == [START + hour * HOUR for hour in range(9)]
+    assert [energy for _, _, energy in hours[:8]] == [0] * 8
+    assert hours[8][2] == 10
+    assert hours[8][1] == 10
+
+
+def test_failed_poll_not_booked(tmp_path, monkeypatch):
+    """Failed polls don't close hours, the gap is spread once the WES answers again."""
+
+    async def run():
+        hass = HomeAssistant(str(tmp_path))
+        hass.config.components.add("recorder")
+        coordinator = FakeCoordinator(parse_payload(PAYLOADS_DIR.joinpath("mono_hc.xml").read_bytes()))
+        statistics = WesEnergyStatistics(hass, coordinator, "entry")
+        hours = []
+        monkeypatch.setattr(statistics, "_async_add_statistics", lambda key, completed: hours.extend(completed))
+        now = START
+        monkeypatch.setattr(energy.time, "time", lambda: now)
+        coordinator.poll(1000)
+        stop = await statistics.async_start()
+        coordinator.last_update_success = False
+        now += 2 * HOUR
+        coordinator.poll(1000)
+        closed = len(hours)
+        coordinator.last_update_success = True
+        coordinator.poll(1200)
+        stop()
+        await hass.async_stop(force=True)
+        return closed, hours
+
+    closed, hours = asyncio.run(run())
+    assert closed == 0
+    assert [energy for _, _, energy in hours] == [100, 100]
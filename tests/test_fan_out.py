@@ -0,0 +1,41 @@
+"""Fan-out of the coordinator updates to the entities bound to the changed fields."""
+import asyncio
+
+from homeassistant.core import HomeAssistant
+
+from cartelectronic_wes.coordinator import WesCoordinator
+from cartelectronic_wes.parser import parse_payload
+from cartelectronic_wes.sensor import ClampVoltageSensor
+from cartelectronic_wes.switch import RelaySwitch
+from cartelectronic_wes.wes import WesApi, WesDevice
+
+from bench_parser import PAYLOADS_DIR
+
+
+def test_entity_added_after_first_refresh(tmp_path):
+    """An entity added after the first refresh gets the current value of a field which never changes."""
+
+    async def run():
+        hass = HomeAssistant(str(tmp_path))
+        api = WesApi("127.0.0.1:1", user="admin", password="wes")
+        api.device = WesDevice("WES1", "1", "1")
+        coordinator = WesCoordinator(hass, api)
+        data = parse_payload(PAYLOADS_DIR.joinpath("tri_tempo.xml").read_bytes())
+        coordinator.async_set_updated_data(data)
+        entities = [ClampVoltageSensor(coordinator), RelaySwitch(coordinator, 1)]
+        for entity in entities:
+            entity.hass = hass
+            entity.entity_id = f"{'switch' if isinstance(entity, RelaySwitch) else 'sensor'}.{entity.unique_id}"
+            await entity.async_added_to_hass()
+        # Another field changed, the ones of the entities didn't
+        data = data.copy()
+        data.set_value(data.layout.fields["clamps.clamp1.I"], "12.5")
+        coordinator.async_set_updated_data(data)
+        states = [hass.states.get(entity.entity_id) for entity in entities]
+        await api.close()
+        await hass.async_stop(force=True)
+        return states
+
+    voltage, relay = asyncio.run(run())
+    assert float(voltage.state) == 233
+    assert relay.state == "on"
@@ -0,0 +1,48 @@
+"""Sensor file uploads to the FTP server of the WES."""
+from ftplib import error_perm
+
+import pytest
+
+from cartelectronic_wes.wes import WesFtp, WesFtpError
+
+from fake_ftp import start_fake_ftp
+
+CONTENT = b"t<data>\nc<temp>cc1</temp>\nt</data>"
+
+
+@pytest.fixture
+def server():
+    server = start_fake_ftp()
+    yield server
+    server.close()
+
+
+def wes_ftp(server, password="wesftp"):
+    return WesFtp("127.0.0.1", "adminftp", password, port=server.port)
+
+
+def test_unchanged_file_is_skipped(server):
+    """A file already holding the data isn't uploaded again, the obsolete ones are deleted."""
+    server.files["ha000001.cgx"] = CONTENT
+    server.files["ha000002.cgx"] = b"old"
+    uploaded = wes_ftp(server).upload_files([("ha000001.cgx", CONTENT), ("ha000003.cgx", CONTENT)], ["ha000002.cgx"])
+    assert uploaded == ["ha000003.cgx"]
+    assert server.uploads == ["ha000003.cgx"]
+    assert "ha000002.cgx" not in server.files
+    # All the files go through a single connection
+    assert server.connections == 1
+
+
+def test_readback_mismatch_raises(server):
+    """A file reading back different from the uploaded data raises WesFtpError."""
+    server.corrupt = lambda data: data[:-1]
+    with pytest.raises(WesFtpError):
+        wes_ftp(server).upload_files([("ha000001.cgx", CONTENT)])
+    assert server.uploads == ["ha000001.cgx"]
+
+
+def test_bad_login_raises(server):
+    """Wrong credentials raise before anything is uploaded."""
+    with pytest.raises(error_perm):
+        wes_ftp(server, password="wrong").upload_files([("ha000001.cgx", CONTENT)])
+    assert server.uploads == []
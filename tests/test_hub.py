@@ -0,0 +1,49 @@
+"""Staggering of the polls of all the devices."""
+import asyncio
+import logging
+
+from homeassistant.core import HomeAssistant
+
+from cartelectronic_wes.coordinator import WesCoordinator
+from cartelectronic_wes.hub import WesHub
+from cartelectronic_wes.wes import WesApi
+
+
+def run_with_coordinators(tmp_path, count, test):
+    async def run():
+        hass = HomeAssistant(str(tmp_path))
+        apis = [WesApi(f"127.0.0.1:{port}", user="admin", password="wes") for port in range(1, count + 1)]
+        try:
+            return test(WesHub(), [WesCoordinator(hass, api) for api in apis])
+        finally:
+            for api in apis:
+                await api.close()
+            await hass.async_stop(force=True)
+
+    return asyncio.run(run())
+
+
+def test_devices_get_their_own_offset(tmp_path):
+    def test(hub, coordinators):
+        for coordinator in coordinators:
+            hub.register(coordinator, parse_executor="inline")
+        return [coordinator._microsecond for coordinator in coordinators]
+
+    offsets = run_with_coordinators(tmp_path, 3, test)
+    assert len(set(offsets)) == 3
+    assert offsets == sorted(offsets)
+
+
+def test_missing_offset_support_logged_once(tmp_path, caplog, monkeypatch):
+    """A Home Assistant version without the private offset attribute doesn't break the registration."""
+    monkeypatch.setattr(WesCoordinator, "_poll_offset_unsupported", False)
+
+    def test(hub, coordinators):
+        for coordinator in coordinators:
+            del coordinator._microsecond
+            hub.register(coordinator, parse_executor="inline")
+        return [coordinator.hub is hub for coordinator in coordinators]
+
+    with caplog.at_level(logging.WARNING):
+        assert run_with_coordinators(tmp_path, 2, test) == [True, True]
+    assert sum("Poll offsets not supported" in record.message for record in caplog.records) == 1
@@ -0,0 +1,23 @@
+"""Parsing of the sensor file payloads."""
+import pytest
+
+from cartelectronic_wes.parser import parse_payload
+
+from bench_parser import PAYLOADS_DIR
+
+
+def test_sensor_file_is_parsed():
+    data = parse_payload(PAYLOADS_DIR.joinpath("probes_30.xml").read_bytes())
+    assert data.get("analog.ad1") == 1.25
+
+
+@pytest.mark.parametrize("payload", [
+    b"<html>\n<body>\n<h1>401 Unauthorized</h1>\n</body>\n</html>\n",
+    b"<data>\n<unknown>1</unknown>\n</data>\n",
+    b"<data>\n</data>\n",
+    b"",
+])
+def test_not_a_sensor_file_raises(payload):
+    """An error page or a file without any known field isn't taken as a snapshot with every value missing."""
+    with pytest.raises(ValueError):
+        parse_payload(payload)
@@ -0,0 +1,64 @@
+"""Values pushed by the WES to the webhook."""
+import asyncio
+
+from homeassistant.core import HomeAssistant
+
+from cartelectronic_wes.calibration import Calibration, parse_calibration
+from cartelectronic_wes.coordinator import WesCoordinator
+from cartelectronic_wes.parser import parse_payload
+from cartelectronic_wes.wes import WesApi
+
+from bench_parser import PAYLOADS_DIR
+from test_wes import FakeWesApi
+
+
+def test_pushed_values_are_calibrated(tmp_path):
+    """A pushed value is calibrated like a polled one, the other calibrated fields are left as is."""
+
+    async def run():
+        hass = HomeAssistant(str(tmp_path))
+        api = WesApi("127.0.0.1:1", user="admin", password="wes", sensor_filename="homeassistant.cgx")
+        api.calibration = Calibration(parse_calibration("analog.ad1=0.1,-5; analog.ad2=2,1"))
+        coordinator = WesCoordinator(hass, api)
+        payload = PAYLOADS_DIR.joinpath("probes_30.xml").read_bytes()
+        payload = payload.replace(b"<ad1>1.25</ad1>", b"<ad1>100</ad1>").replace(b"<ad2>0.00</ad2>", b"<ad2>10</ad2>")
+        data = parse_payload(payload)
+        api.calibration.apply(data)
+        coordinator.async_set_updated_data(data)
+        coordinator.async_apply_push({"analog.ad1": "200", "relays.relay1.enabled": "1"})
+        pushed = coordinator.data
+        await api.close()
+        await hass.async_stop(force=True)
+        return data, pushed
+
+    polled, pushed = asyncio.run(run())
+    assert polled.get("analog.ad1") == 5
+    assert pushed.get("analog.ad1") == 15
+    assert pushed.get("analog.ad2") == 21
+    assert pushed.get("relays.relay1.enabled") == 1
+
+
+def test_pushed_slow_value_kept_by_next_poll(tmp_path):
+    """A pushed value of a slow file isn't undone by the merged data of the next poll."""
+
+    async def run():
+        hass = HomeAssistant(str(tmp_path))
+        fast = parse_payload(b"<data>\n<clamps>\n<V>230</V>\n</clamps>\n</data>\n")
+        api = FakeWesApi({
+            "fast.cgx": fast,
+            "slow.cgx": parse_payload(b"<data>\n<analog>\n<ad1>1.25</ad1>\n</analog>\n</data>\n"),
+        })
+        api.use_sensor_files([("fast.cgx", 0), ("slow.cgx", 60)])
+        coordinator = WesCoordinator(hass, api)
+        await coordinator.async_refresh()
+        coordinator.async_apply_push({"analog.ad1": "9.5"})
+        pushed = coordinator.data.get("analog.ad1")
+        # The device renders the pushed value, the fast file is unchanged
+        api.files["slow.cgx"] = parse_payload(b"<data>\n<analog>\n<ad1>9.5</ad1>\n</analog>\n</data>\n")
+        await coordinator.async_refresh()
+        polled = coordinator.data.get("analog.ad1")
+        await api.close()
+        await hass.async_stop(force=True)
+        return pushed, polled
+
+    assert asyncio.run(run()) == (9.5, 9.5)
@@ -0,0 +1,51 @@
+"""Adaptive delay between two polls."""
+import pytest
+
+from cartelectronic_wes import scheduler
+from cartelectronic_wes.scheduler import AdaptivePollInterval, PUSH_TRUST_PERIODS
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    return clock
+
+
+def test_regular_pushes_keep_the_max_interval(clock):
+    interval = AdaptivePollInterval(10, 1, 60)
+    for _ in range(10):
+        interval.on_push()
+        clock.now += 120
+        assert interval.on_success(False) == 60
+
+
+def test_missing_push_drops_the_trust(clock):
+    """Once the device stops pushing, stable polls back off from the configured interval again."""
+    interval = AdaptivePollInterval(10, 1, 60)
+    for _ in range(3):
+        interval.on_push()
+        clock.now += 120
+    interval.on_push()
+    assert interval.on_success(False) == 60
+    # Minutes later without any push, not the next 24 hours
+    clock.now += PUSH_TRUST_PERIODS * 120 + 1
+    assert interval.on_success(False) == 12.5
+    assert not interval.push_trusted(clock.now)
+
+
+def test_single_push_trusted_for_a_few_polls(clock):
+    interval = AdaptivePollInterval(10, 1, 60)
+    interval.on_push()
+    clock.now += PUSH_TRUST_PERIODS * 60
+    assert interval.on_success(False) == 60
+    clock.now += 1
+    assert interval.on_success(False) == 12.5
@@ -0,0 +1,74 @@
+"""Meter models deciding the TIC entities created on a rebuild."""
+import pytest
+
+from cartelectronic_wes.parser import parse_payload
+from cartelectronic_wes.tic import (
+    TicMeterModel,
+    PERIOD_OFF_PEAK,
+    PERIOD_PEAK,
+    TEMPO_RED,
+    TEMPO_WHITE,
+    tariff_period,
+    tempo_colour,
+    tic_meter_model,
+)
+
+from bench_parser import PAYLOADS_DIR
+
+
+def load(name):
+    return parse_payload(PAYLOADS_DIR.joinpath(f"{name}.xml").read_bytes())
+
+
+def test_mono_phase_hc():
+    assert tic_meter_model(load("mono_hc"), 1) == TicMeterModel(
+        tariff="HC",
+        phases=1,
+        index_labels=("H_PLEINE", "H_CREUSE"),
+        apparent_power_labels=("PAP",),
+        intensity_labels=("IINST", "IMAX"),
+        voltage_labels=(),
+        subscription_labels=("OPTARIF", "ISOUSC", "PTEC"),
+    )
+
+
+def test_three_phase_tempo():
+    assert tic_meter_model(load("tri_tempo"), 1) == TicMeterModel(
+        tariff="BBR",
+        phases=3,
+        index_labels=("BBRHCJB", "BBRHPJB", "BBRHCJW", "BBRHPJW", "BBRHCJR", "BBRHPJR"),
+        apparent_power_labels=("PAP",),
+        intensity_labels=("IINST1", "IINST2", "IINST3", "IMAX1", "IMAX2", "IMAX3"),
+        voltage_labels=("TENSION1", "TENSION2", "TENSION3"),
+        subscription_labels=("OPTARIF", "ISOUSC", "PTEC", "DEMAIN"),
+    )
+
+
+@pytest.mark.parametrize("name, id", [("pas_dispo", 1), ("pas_dispo", 2), ("mono_hc", 2)])
+def test_meter_not_connected(name, id):
+    assert tic_meter_model(load(name), id) is None
+
+
+def test_unknown_tariff_keeps_the_indexes_in_use():
+    data = load("mono_hc")
+    data.set_value(data.layout.fields["tics.tic1.OPTARIF"], "XYZ")
+    model = tic_meter_model(data, 1)
+    assert model.tariff == "XYZ"
+    assert model.index_labels == ("H_PLEINE", "H_CREUSE")
+
+
+@pytest.mark.parametrize("ptec, period, colour", [
+    ("HP..", PERIOD_PEAK, None),
+    ("HC..", PERIOD_OFF_PEAK, None),
+    ("HPJR", PERIOD_PEAK, TEMPO_RED),
+    ("HCJW", PERIOD_OFF_PEAK, TEMPO_WHITE),
+    ("XX..", None, None),
+    (None, None, None),
+])
+def test_tariff_period(ptec, period, colour):
+    assert tariff_period(ptec) == (period, colour)
+
+
+def test_tempo_colour():
+    assert tempo_colour("ROUG") == TEMPO_RED
+    assert tempo_colour("----") is None
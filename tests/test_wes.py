@@ -0,0 +1,133 @@
+"""Polling of the sensor files by WesApi."""
+import asyncio
+
+import pytest
+from aiohttp import web
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import UpdateFailed
+
+from cartelectronic_wes.coordinator import WesCoordinator
+from cartelectronic_wes.parser import parse_payload
+from cartelectronic_wes.wes import WesApi, commands_conflict
+
+from bench_parser import PAYLOADS_DIR
+
+
+class FakeWesApi(WesApi):
+    """WesApi serving the files from a dict, a file mapped to an exception raises it."""
+
+    def __init__(self, files) -> None:
+        super().__init__("127.0.0.1:1", user="admin", password="wes")
+        self.files = files
+
+    async def fetch_xml_data(self, url):
+        result = self.files[url.lstrip("/")]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def fetch(files):
+    async def run():
+        api = FakeWesApi(files)
+        api.use_sensor_files([("fast.cgx", 0), ("slow.cgx", 60)])
+        try:
+            return await api.fetch_sensor_data()
+        finally:
+            await api.close()
+
+    return asyncio.run(run())
+
+
+def test_slow_file_error_keeps_the_poll():
+    """A slow file raising is skipped like a failed one, the fast data is still returned."""
+    data = parse_payload(PAYLOADS_DIR.joinpath("probes_30.xml").read_bytes())
+    assert fetch({"fast.cgx": data, "slow.cgx": asyncio.TimeoutError()}) is not None
+
+
+def test_main_file_error_fails_the_poll():
+    data = parse_payload(PAYLOADS_DIR.joinpath("probes_30.xml").read_bytes())
+    with pytest.raises(asyncio.TimeoutError):
+        fetch({"fast.cgx": asyncio.TimeoutError(), "slow.cgx": data})
+
+
+def test_error_page_fails_the_poll(tmp_path):
+    """A page which isn't a sensor file makes the poll fail instead of reading every value as missing."""
+
+    async def run():
+        async def error_page(request):
+            return web.Response(body=b"<html>\n<body>Busy</body>\n</html>\n")
+
+        app = web.Application()
+        app.router.add_get("/{filename}", error_page)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        hass = HomeAssistant(str(tmp_path))
+        api = WesApi(f"127.0.0.1:{port}", user="admin", password="wes", sensor_filename="homeassistant.cgx")
+        coordinator = WesCoordinator(hass, api)
+        try:
+            with pytest.raises(UpdateFailed):
+                await coordinator._async_update_data()
+        finally:
+            await api.close()
+            await runner.cleanup()
+            await hass.async_stop(force=True)
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("batch, params, conflict", [
+    # Set and toggle of the same channel depend on the order the device processes them
+    ({"rl1": 1}, {"frl": 1}, True),
+    ({"frl": 2}, {"rl2": 0}, True),
+    ({"vs3": 1}, {"fvs": 3}, True),
+    # A toggle param holds a single channel
+    ({"frl": 1}, {"frl": 2}, True),
+    # Different channels
+    ({"rl1": 1}, {"frl": 2}, False),
+    ({"rl1": 1}, {"vs1": 0}, False),
+    ({"frl": 1}, {"fvs": 1}, False),
+    # The same channel set again, the last value wins
+    ({"rl1": 1}, {"rl1": 0}, False),
+])
+def test_commands_conflict(batch, params, conflict):
+    assert commands_conflict(batch, params) is conflict
+
+
+class RecordingWesApi(WesApi):
+    """WesApi recording the AJAX requests instead of sending them."""
+
+    def __init__(self) -> None:
+        super().__init__("127.0.0.1:1", user="admin", password="wes")
+        self.requests = []
+
+    async def ajax_command(self, params):
+        self.requests.append(dict(params))
+        return True
+
+
+def send_commands(*commands):
+    async def run():
+        api = RecordingWesApi()
+        try:
+            await asyncio.gather(*(api.queue_command(params) for params in commands))
+        finally:
+            await api.close()
+        return api.requests
+
+    return asyncio.run(run())
+
+
+def test_commands_batched():
+    assert send_commands({"rl1": 1}, {"frl": 2}, {"vs1": 0}) == [{"rl1": 1, "frl": 2, "vs1": 0}]
+
+
+def test_repeated_sets_last_one_wins():
+    assert send_commands({"rl1": 1}, {"rl1": 0}) == [{"rl1": 0}]
+
+
+def test_set_and_toggle_of_a_channel_kept_apart():
+    assert send_commands({"rl1": 1}, {"frl": 1}) == [{"rl1": 1}, {"frl": 1}]